@@ -1,16 +1,13 @@
 # backfill_cl.py
 
-import pandas as pd
-import numpy as np
-import blpapi
 import os
-import math
+import sys
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Optional
 from fetch_config import FetchConfig
 from data_fetcher import (start_bloomberg_session, generate_futures_tickers, 
-                         fetch_metadata_batch, fetch_price_volume_batch,
-                         process_price_volume_data, save_commodity_data)
+                         fetch_metadata, fetch_price_volume_data,
+                         save_commodity_data)
 
 def fetch_full_history(commodity: str, config: FetchConfig):
     """Force fetch complete historical data ignoring existing data"""
@@ -23,15 +20,9 @@ def fetch_full_history(commodity: str, config: FetchConfig):
         tickers = generate_futures_tickers(commodity, config)
         print(f"Generated {len(tickers)} tickers")
         
-        # Fetch metadata
+        # Fetch metadata, batches are sent concurrently
         print("\nFetching metadata...")
-        metadata = {}
-        batches = np.array_split(tickers, math.ceil(len(tickers)/config.BATCH_SIZE))
-        
-        for i, batch in enumerate(batches, 1):
-            print(f"Processing metadata batch {i}/{len(batches)}")
-            batch_metadata = fetch_metadata_batch(session, batch)
-            metadata.update(batch_metadata)
+        metadata = fetch_metadata(session, tickers, config)
         
         print(f"Fetched metadata for {len(metadata)} contracts")
         
@@ -40,32 +31,10 @@ def fetch_full_history(commodity: str, config: FetchConfig):
         start_date = datetime(config.START_YEAR, 1, 1)
         end_date = datetime.now()
         
-        raw_data = pd.DataFrame()
-        for i, batch in enumerate(batches, 1):
-            print(f"Processing price/volume batch {i}/{len(batches)}")
-            batch_data = fetch_price_volume_batch(
-                session=session,
-                securities_batch=batch,
-                fields=config.DEFAULT_FIELDS,
-                start_date=start_date,
-                end_date=end_date
-            )
-            
-            if not batch_data.empty:
-                if raw_data.empty:
-                    raw_data = batch_data
-                else:
-                    new_cols = [col for col in batch_data.columns if col not in raw_data.columns]
-                    if new_cols:
-                        raw_data = pd.concat([raw_data, batch_data[new_cols]], axis=1)
-            
-            print(f"Batch {i} complete. Current data shape: {raw_data.shape}")
+        prices_df, volumes_df = fetch_price_volume_data(
+            session, tickers, start_date, end_date, config)
         
-        if not raw_data.empty:
-            # Process into prices and volumes
-            print("\nProcessing raw data into prices and volumes...")
-            prices_df, volumes_df = process_price_volume_data(raw_data)
-            
+        if not prices_df.empty:
             print(f"\nFetched data summary:")
             print(f"Date range: {prices_df.index.min().date()} to {prices_df.index.max().date()}")
             print(f"Number of contracts: {len(prices_df.columns)}")
@@ -83,7 +52,8 @@ def fetch_full_history(commodity: str, config: FetchConfig):
     finally:
         session.stop()
 
-def main():
+def main(replay_path: Optional[str] = None):
+    """Backfill CL, from a recorded session instead of the terminal if replay_path is given"""
     print("Starting forced CL historical backfill...")
     
     # Setup config
@@ -92,8 +62,11 @@ def main():
         START_YEAR=1985,
         MIN_FORWARD_YEARS=2,
         BATCH_SIZE=50,
-        COMMODITIES=['CL']
+        COMMODITIES=['CL'],
+        REPLAY_PATH=replay_path
     )
+    if config.REPLAY_PATH:
+        print(f"Replaying Bloomberg responses from {config.REPLAY_PATH}")
     
     # Create backup path
     backup_path = None
@@ -132,4 +105,4 @@ def main():
             print("Restored backup due to error")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
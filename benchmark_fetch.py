@@ -0,0 +1,61 @@
+# benchmark_fetch.py
+
+import os
+import time
+from datetime import datetime
+from fetch_config import FetchConfig
+from data_fetcher import (start_bloomberg_session, generate_futures_tickers,
+                         fetch_metadata, fetch_price_volume_data)
+
+def benchmark_fetch(commodity: str, recording_path: str, in_flight_values=(1, 2, 4, 8),
+                    latency: float = 0.25, fragment_size: int = 5):
+    """Time a full metadata and history fetch against a recorded replay"""
+    results = {}
+    
+    for max_in_flight in in_flight_values:
+        config = FetchConfig(
+            BASE_PATH=os.getcwd(),
+            REPLAY_PATH=recording_path,
+            REPLAY_LATENCY=latency,
+            REPLAY_FRAGMENT_SIZE=fragment_size,
+            MAX_IN_FLIGHT_REQUESTS=max_in_flight
+        )
+        print(f"\n{'='*50}")
+        print(f"{commodity} with {max_in_flight} requests in flight")
+        print(f"{'='*50}")
+        
+        session = start_bloomberg_session(config)
+        try:
+            tickers = generate_futures_tickers(commodity, config)
+            start_time = time.perf_counter()
+            metadata = fetch_metadata(session, tickers, config)
+            prices_df, volumes_df = fetch_price_volume_data(
+                session, tickers, datetime(config.START_YEAR, 1, 1), datetime.now(), config)
+            elapsed = time.perf_counter() - start_time
+        finally:
+            session.stop()
+        
+        results[max_in_flight] = {
+            'seconds': elapsed,
+            'requests': session.requests_sent,
+            'values': int(prices_df.notna().sum().sum()) if not prices_df.empty else 0
+        }
+    
+    # Print summary
+    print("\nFetch Benchmark Summary:")
+    print("=" * 80)
+    print(f"{'In Flight':<10} {'Requests':<10} {'Seconds':<10} {'Requests/s':<12} {'Prices/s'}")
+    print("-" * 80)
+    for max_in_flight, result in results.items():
+        print(f"{max_in_flight:<10} {result['requests']:<10} {result['seconds']:<10.2f} "
+              f"{result['requests'] / result['seconds']:<12.1f} {result['values'] / result['seconds']:,.0f}")
+    
+    return results
+
+def main():
+    # Record once against the terminal with FetchConfig(RECORD_PATH=...), then replay
+    recording_path = os.path.join(os.getcwd(), 'recordings', 'CL.json.gz')
+    benchmark_fetch('CL', recording_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+# bloomberg_replay.py
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Dict, List
+
+try:
+    import blpapi
+except ImportError:
+    # Replay runs without the Bloomberg SDK, only recording needs it
+    blpapi = None
+
+class ReplayEventType:
+    """blpapi.Event type values, for replays without the SDK"""
+    REQUEST_STATUS = 4
+    RESPONSE = 5
+    PARTIAL_RESPONSE = 6
+    TIMEOUT = 10
+
+class ReplayCorrelationId:
+    """blpapi.CorrelationId holding an integer, for replays without the SDK"""
+
+    def __init__(self, value: int):
+        self._value = value
+
+    def value(self) -> int:
+        return self._value
+
+# The SDK's own types when it is installed, so live and replayed events compare alike
+EventType = blpapi.Event if blpapi is not None else ReplayEventType
+CorrelationId = blpapi.CorrelationId if blpapi is not None else ReplayCorrelationId
+
+def element_to_data(element: blpapi.Element):
+    """Convert a blpapi element tree to plain Python data"""
+    if element.isArray():
+        if element.isComplexType():
+            return [element_to_data(element.getValueAsElement(i)) for i in range(element.numValues())]
+        return [element.getValue(i) for i in range(element.numValues())]
+    if element.isComplexType():
+        return {str(e.name()): element_to_data(e) for e in element.elements()}
+    return element.getValue()
+
+def encode_value(value):
+    """JSON-safe representation of a field value"""
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    return value
+
+def decode_value(value):
+    """Inverse of encode_value"""
+    if isinstance(value, dict):
+        if '$datetime' in value:
+            return datetime.fromisoformat(value['$datetime'])
+        if '$date' in value:
+            return date.fromisoformat(value['$date'])
+    return value
+
+class Recording:
+    """
+    Reference and historical responses keyed by security, so a replay can
+    answer requests batched differently from the recorded ones.
+    """
+
+    def __init__(self):
+        self.reference = {}
+        self.historical = {}
+
+    def add_message(self, msg: blpapi.Message):
+        """Store the security data of a reference or historical response"""
+        message_type = str(msg.messageType())
+        data = element_to_data(msg.asElement())
+
+        if message_type == 'ReferenceDataResponse':
+            for security_data in data.get('securityData', []):
+                fields = self.reference.setdefault(security_data['security'], {})
+                fields.update(security_data.get('fieldData', {}))
+        elif message_type == 'HistoricalDataResponse':
+            security_data = data['securityData']
+            rows = self.historical.setdefault(security_data['security'], {})
+            for row in security_data.get('fieldData', []):
+                row = dict(row)
+                row_date = row.pop('date')
+                if isinstance(row_date, datetime):
+                    row_date = row_date.date()
+                rows[row_date] = row
+
+    def save(self, path: str):
+        """Write the recording as gzipped JSON with column-oriented history"""
+        historical = {}
+        for security, rows in self.historical.items():
+            dates = sorted(rows)
+            fields = sorted({field for row in rows.values() for field in row})
+            historical[security] = {'date': [d.isoformat() for d in dates]}
+            for field in fields:
+                historical[security][field] = [encode_value(rows[d].get(field)) for d in dates]
+
+        reference = {
+            security: {field: encode_value(value) for field, value in fields.items()}
+            for security, fields in self.reference.items()
+        }
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with gzip.open(path, 'wt') as f:
+            json.dump({'reference': reference, 'historical': historical}, f,
+                      separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        """Read a recording written by save"""
+        recording = cls()
+        if not os.path.exists(path):
+            return recording
+
+        with gzip.open(path, 'rt') as f:
+            data = json.load(f)
+
+        recording.reference = {
+            security: {field: decode_value(value) for field, value in fields.items()}
+            for security, fields in data['reference'].items()
+        }
+        for security, columns in data['historical'].items():
+            fields = [field for field in columns if field != 'date']
+            rows = {}
+            for i, d in enumerate(columns['date']):
+                rows[date.fromisoformat(d)] = {
+                    field: decode_value(columns[field][i])
+                    for field in fields if columns[field][i] is not None
+                }
+            recording.historical[security] = rows
+        return recording
+
+class RecordingSession:
+    """Live session wrapper that records every response it hands out"""
+
+    def __init__(self, session: blpapi.Session, path: str):
+        if blpapi is None:
+            raise ImportError("Recording Bloomberg responses requires blpapi")
+        self.session = session
+        self.path = path
+        self.recording = Recording.load(path)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def nextEvent(self, timeout: int = 0):
+        event = self.session.nextEvent(timeout)
+        self.record_event(event)
+        return event
+
+    def record_event(self, event):
+        """Record the responses in an event taken from any queue"""
+        if event.eventType() in [EventType.PARTIAL_RESPONSE, EventType.RESPONSE]:
+            with self._lock:
+                for msg in event:
+                    self.recording.add_message(msg)
+
+    def stop(self):
+        self.recording.save(self.path)
+        print(f"Saved Bloomberg recording to {self.path}")
+        return self.session.stop()
+
+class ReplayElement:
+    """Read-only element over recorded Python data"""
+
+    def __init__(self, name: str, value):
+        self._name = name
+        self._value = value
+
+    def name(self) -> str:
+        return self._name
+
+    def hasElement(self, name: str) -> bool:
+        return isinstance(self._value, dict) and name in self._value
+
+    def getElement(self, name: str) -> 'ReplayElement':
+        if not self.hasElement(name):
+            raise KeyError(f"Element {name} not found in {self._name}")
+        return ReplayElement(name, self._value[name])
+
+    def numValues(self) -> int:
+        return len(self._value) if isinstance(self._value, list) else 1
+
+    def getValueAsElement(self, index: int) -> 'ReplayElement':
+        return ReplayElement(self._name, self._value[index])
+
+    def getElementAsString(self, name: str) -> str:
+        value = self.getElement(name)._value
+        return value.isoformat() if isinstance(value, date) else str(value)
+
+    def getElementAsFloat(self, name: str) -> float:
+        return float(self.getElement(name)._value)
+
+    def getElementAsDatetime(self, name: str):
+        return self.getElement(name)._value
+
+class ReplayMessage:
+    """Recorded response message tagged with the request's correlation ID"""
+
+    def __init__(self, message_type: str, correlation_id, data: Dict):
+        self._message_type = message_type
+        self._correlation_id = correlation_id
+        self._element = ReplayElement(message_type, data)
+
+    def messageType(self) -> str:
+        return self._message_type
+
+    def correlationIds(self) -> List:
+        return [self._correlation_id]
+
+    def asElement(self) -> ReplayElement:
+        return self._element
+
+    def hasElement(self, name: str) -> bool:
+        return self._element.hasElement(name)
+
+    def getElement(self, name: str) -> ReplayElement:
+        return self._element.getElement(name)
+
+class ReplayEvent:
+    """Event holding a fragment of a replayed response"""
+
+    def __init__(self, event_type: int, messages: List[ReplayMessage]):
+        self._event_type = event_type
+        self._messages = messages
+
+    def eventType(self) -> int:
+        return self._event_type
+
+    def __iter__(self):
+        return iter(self._messages)
+
+class ReplayRequest:
+    """Captures the settings of a request built through createRequest"""
+
+    def __init__(self, request_type: str):
+        self.request_type = request_type
+        self.values = {}
+
+    def append(self, name: str, value):
+        self.values.setdefault(name, []).append(str(value))
+
+    def set(self, name: str, value):
+        self.values[name] = value
+
+class ReplayService:
+    def createRequest(self, request_type: str) -> ReplayRequest:
+        return ReplayRequest(request_type)
+
+class ReplayEventQueue:
+    """
+    Pending replayed responses. Ready responses are served round-robin,
+    one fragment per event, like interleaved responses from the terminal.
+    """
+
+    def __init__(self):
+        self._responses = deque()
+        self._lock = threading.Lock()
+
+    def add(self, ready_at: float, fragments: List[List[ReplayMessage]]):
+        with self._lock:
+            self._responses.append([ready_at, deque(fragments)])
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def _next_fragment(self, now: float):
+        with self._lock:
+            for _ in range(len(self._responses)):
+                response = self._responses.popleft()
+                ready_at, fragments = response
+                if ready_at <= now:
+                    messages = fragments.popleft()
+                    if fragments:
+                        self._responses.append(response)
+                        return ReplayEvent(EventType.PARTIAL_RESPONSE, messages)
+                    return ReplayEvent(EventType.RESPONSE, messages)
+                self._responses.append(response)
+
+            # Nothing ready: time the next response becomes available
+            return min((response[0] for response in self._responses), default=None)
+
+    def nextEvent(self, timeout: int = 0) -> ReplayEvent:
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            now = time.monotonic()
+            result = self._next_fragment(now)
+            if isinstance(result, ReplayEvent):
+                return result
+            if result is None or now >= deadline:
+                return ReplayEvent(EventType.TIMEOUT, [])
+            time.sleep(max(0.0, min(result, deadline) - now))
+
+class ReplaySession:
+    """
+    Offline stand-in for blpapi.Session answering requests from a Recording.
+    Each response becomes available after `latency` seconds and is split
+    into events of `fragment_size` messages (0 keeps one event per request).
+    Reference responses carry `securities_per_message` securities each.
+    """
+
+    def __init__(self, recording: Recording, latency: float = 0.0,
+                 fragment_size: int = 0, securities_per_message: int = 10):
+        self.recording = recording
+        self.latency = latency
+        self.fragment_size = fragment_size
+        self.securities_per_message = max(1, securities_per_message)
+        self.requests_sent = 0
+        self._event_queue = ReplayEventQueue()
+
+    def start(self) -> bool:
+        return True
+
+    def openService(self, name: str) -> bool:
+        return True
+
+    def getService(self, name: str) -> ReplayService:
+        return ReplayService()
+
+    def stop(self) -> bool:
+        self._event_queue.clear()
+        return True
+
+    def sendRequest(self, request: ReplayRequest, identity=None,
+                    correlationId=None, eventQueue=None, requestLabel=''):
+        if correlationId is None:
+            correlationId = CorrelationId(self.requests_sent)
+        self.requests_sent += 1
+
+        if request.request_type == 'HistoricalDataRequest':
+            messages = self._historical_messages(request, correlationId)
+        elif request.request_type == 'ReferenceDataRequest':
+            messages = self._reference_messages(request, correlationId)
+        else:
+            raise ValueError(f"Replay does not support {request.request_type}")
+
+        size = self.fragment_size if self.fragment_size > 0 else max(1, len(messages))
+        fragments = [messages[i:i + size] for i in range(0, len(messages), size)] or [[]]
+        queue = eventQueue if eventQueue is not None else self._event_queue
+        queue.add(time.monotonic() + self.latency, fragments)
+        return correlationId
+
+    def nextEvent(self, timeout: int = 0) -> ReplayEvent:
+        return self._event_queue.nextEvent(timeout)
+
+    def _historical_messages(self, request: ReplayRequest, correlation_id) -> List[ReplayMessage]:
+        fields = request.values.get('fields', [])
+        start = datetime.strptime(request.values['startDate'], "%Y%m%d").date()
+        end = datetime.strptime(request.values['endDate'], "%Y%m%d").date()
+
+        messages = []
+        for security in request.values.get('securities', []):
+            rows = self.recording.historical.get(security, {})
+            field_data = []
+            for d in sorted(rows):
+                if start <= d <= end:
+                    values = {f: rows[d][f] for f in fields if f in rows[d]}
+                    if values:
+                        field_data.append({'date': d, **values})
+
+            security_data = {'security': security, 'fieldData': field_data}
+            if security not in self.recording.historical:
+                security_data['securityError'] = {'message': 'Unknown/Invalid security'}
+            messages.append(ReplayMessage('HistoricalDataResponse', correlation_id,
+                                          {'securityData': security_data}))
+        return messages
+
+    def _reference_messages(self, request: ReplayRequest, correlation_id) -> List[ReplayMessage]:
+        fields = request.values.get('fields', [])
+        securities = request.values.get('securities', [])
+
+        messages = []
+        for i in range(0, len(securities), self.securities_per_message):
+            security_data = []
+            for security in securities[i:i + self.securities_per_message]:
+                recorded = self.recording.reference.get(security)
+                entry = {'security': security, 'fieldData': {
+                    f: recorded[f] for f in fields if recorded and f in recorded
+                }}
+                if recorded is None:
+                    entry['securityError'] = {'message': 'Unknown/Invalid security'}
+                security_data.append(entry)
+            messages.append(ReplayMessage('ReferenceDataResponse', correlation_id,
+                                          {'securityData': security_data}))
+        return messages
+
+def open_replay_session(path: str, latency: float = 0.0, fragment_size: int = 0) -> ReplaySession:
+    """Replay session over a recording file"""
+    recording = Recording.load(path)
+    print(f"Replaying {len(recording.historical)} historical and "
+          f"{len(recording.reference)} reference securities from {path}")
+    return ReplaySession(recording, latency=latency, fragment_size=fragment_size)
@@ -2,11 +2,130 @@ import os
 from datetime import datetime
 from fetch_config import FetchConfig
 from spreads_config import SpreadsConfig
-from spreads_calculator import create_monthly_futures_data, save_spread_data
+from raw_store import raw_data_exists, load_raw_data, get_raw_data_summary
+from spreads_calculator import (create_monthly_futures_data, save_spread_data,
+                                get_incremental_start, load_liquidity_volumes)
+from spreads_pyramid import update_pyramid
+from roll_calendar import update_roll_table
+from continuous_series import update_continuous_series
+from inter_market import update_inter_market
+from seasonality import update_seasonality
+from spread_ranks import update_spread_ranks
+from rolling_stats import update_rolling_stats
 import pandas as pd
 import json
+from typing import Dict
 from tqdm import tqdm  # For progress bars
 
+def calculate_spreads_for_commodity(commodity: str, fetch_config: FetchConfig,
+                                    spreads_config: SpreadsConfig) -> Dict:
+    """Calculate and save spreads for one commodity, returns a result summary"""
+    try:
+        # Load raw data
+        commodity_path = os.path.join(fetch_config.RAW_DATA_PATH, commodity)
+        metadata_path = os.path.join(commodity_path, 'metadata.json')
+        
+        if not raw_data_exists(commodity, fetch_config.RAW_DATA_PATH):
+            print(f"❌ No price data found for {commodity}")
+            return {'success': False, 'error': 'No price data found'}
+            
+        # Stored range from the manifest, without reading the data
+        summary = get_raw_data_summary(commodity, fetch_config.RAW_DATA_PATH)
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+            
+        print(f"✓ Stored data: {summary['start_date'][:10]} to {summary['end_date'][:10]}")
+        print(f"✓ Number of contracts: {summary['contracts_count']}")
+        
+        # Only recalculate new dates if nothing else changed
+        start_date = get_incremental_start(commodity, summary['start_date'], metadata, spreads_config)
+        if start_date is not None:
+            print(f"Incremental update from {start_date.date()}")
+        else:
+            print(f"Full rebuild for {commodity}")
+        
+        # Load data, only the partitions needed
+        print(f"Loading data for {commodity}...")
+        prices_df = load_raw_data(commodity, fetch_config.RAW_DATA_PATH, start_date=start_date)
+        volumes_df = load_liquidity_volumes(commodity, fetch_config.RAW_DATA_PATH,
+                                            spreads_config, start_date)
+        
+        # Calculate spreads
+        print(f"Calculating spreads for {commodity}...")
+        spread_data = create_monthly_futures_data(
+            prices_df=prices_df,
+            metadata=metadata,
+            config=spreads_config,
+            start_date=start_date,
+            volumes_df=volumes_df
+        )
+        
+        # Save results
+        print(f"Saving spread calculations for {commodity}...")
+        save_spread_data(commodity, spread_data, spreads_config, metadata=metadata,
+                         append=start_date is not None)
+        
+        # Weekly and monthly levels for long-history charts
+        update_pyramid(commodity, spreads_config)
+        
+        # Sorted history windows for percentile ranks of new prints
+        ranks = update_spread_ranks(commodity, spreads_config)
+        
+        # Rolling means, volatilities and z-scores streamed from saved state
+        update_rolling_stats(commodity, spreads_config)
+        
+        # Roll table shared by the visualizer and exporter
+        update_roll_table(commodity, fetch_config.RAW_DATA_PATH, spreads_config, start_date)
+        
+        # Back-adjusted continuous series of every month slot
+        update_continuous_series(commodity, fetch_config.RAW_DATA_PATH, spreads_config)
+        
+        # Delivery-month index with seasonal paths and bands
+        update_seasonality(commodity, fetch_config.RAW_DATA_PATH, spreads_config,
+                           fetch_config.MONTHS)
+        
+        # Unpack and analyze results
+        monthly_futures, spreads_dollar, spreads_percent, spreads_annual = spread_data[:4]
+        last_date = spreads_dollar.index.max()
+        
+        result = {
+            'success': True,
+            'last_date': last_date,
+            'spreads_calculated': {
+                'dollar': len(spreads_dollar.columns),
+                'percent': len(spreads_percent.columns),
+                'annual': len(spreads_annual.columns)
+            }
+        }
+        
+        # Show spread summary
+        print(f"\nResults for {commodity}:")
+        print(f"✓ Dollar spreads: {len(spreads_dollar.columns)}")
+        print(f"✓ Percentage spreads: {len(spreads_percent.columns)}")
+        print(f"✓ Annualized spreads: {len(spreads_annual.columns)}")
+        
+        # Show latest spreads, one row per spread, with where the dollar
+        # spread sits in its history
+        print(f"\nLatest spreads for {commodity} ({last_date.date()}):")
+        latest_dollar = spreads_dollar.loc[last_date]
+        latest_spreads = pd.DataFrame({
+            'Dollar': latest_dollar,
+            'Percent': spreads_percent.loc[last_date].rename(lambda c: c[:-len('_pct')]),
+            'Annual': spreads_annual.loc[last_date].rename(lambda c: c[:-len('_pct_annual')])
+        })
+        for window, window_ranks in ranks.get('dollar', {}).items():
+            latest_spreads[f'Pctl {window}'] = window_ranks.percentile(latest_dollar)
+        if 'all' in ranks.get('dollar', {}):
+            latest_spreads['Z all'] = ranks['dollar']['all'].zscore(latest_dollar)
+        print(latest_spreads.round(4))
+        
+        print(f"\n✓ Successfully processed {commodity}")
+        return result
+        
+    except Exception as e:
+        print(f"❌ Error processing {commodity}: {e}")
+        return {'success': False, 'error': str(e)}
+
 def calculate_spreads_for_all():
     """Calculate spreads for all commodities with available data"""
     # Setup configs
@@ -22,75 +141,15 @@ def calculate_spreads_for_all():
         print(f"\n[{i}/{total_commodities}] Processing {commodity}")
         print("=" * 50)
         
-        try:
-            # Load raw data
-            commodity_path = os.path.join(fetch_config.RAW_DATA_PATH, commodity)
-            prices_path = os.path.join(commodity_path, 'prices.parquet')
-            metadata_path = os.path.join(commodity_path, 'metadata.json')
-            
-            if not os.path.exists(prices_path):
-                print(f"❌ No price data found for {commodity}")
-                results[commodity] = {'success': False, 'error': 'No price data found'}
-                continue
-                
-            # Load data
-            print(f"Loading data for {commodity}...")
-            prices_df = pd.read_parquet(prices_path)
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                
-            print(f"✓ Loaded data: {prices_df.index.min().date()} to {prices_df.index.max().date()}")
-            print(f"✓ Number of contracts: {len(prices_df.columns)}")
-            
-            # Calculate spreads
-            print(f"Calculating spreads for {commodity}...")
-            spread_data = create_monthly_futures_data(
-                prices_df=prices_df,
-                metadata=metadata,
-                config=spreads_config
-            )
-            
-            # Save results
-            print(f"Saving spread calculations for {commodity}...")
-            save_spread_data(commodity, spread_data, spreads_config)
-            
-            # Unpack and analyze results
-            monthly_futures, spreads_dollar, spreads_percent, spreads_annual, _ = spread_data
-            last_date = spreads_dollar.index.max()
-            
-            results[commodity] = {
-                'success': True,
-                'last_date': last_date,
-                'spreads_calculated': {
-                    'dollar': len(spreads_dollar.columns),
-                    'percent': len(spreads_percent.columns),
-                    'annual': len(spreads_annual.columns)
-                }
-            }
-            
-            # Show spread summary
-            print(f"\nResults for {commodity}:")
-            print(f"✓ Dollar spreads: {len(spreads_dollar.columns)}")
-            print(f"✓ Percentage spreads: {len(spreads_percent.columns)}")
-            print(f"✓ Annualized spreads: {len(spreads_annual.columns)}")
-            
-            # Show latest spreads
-            print(f"\nLatest spreads for {commodity} ({last_date.date()}):")
-            latest_spreads = pd.DataFrame({
-                'Dollar': spreads_dollar.loc[last_date],
-                'Percent': spreads_percent.loc[last_date],
-                'Annual': spreads_annual.loc[last_date]
-            })
-            print(latest_spreads.round(4))
-            
-            print(f"\n✓ Successfully processed {commodity}")
-            
-        except Exception as e:
-            print(f"❌ Error processing {commodity}: {e}")
-            results[commodity] = {'success': False, 'error': str(e)}
+        results[commodity] = calculate_spreads_for_commodity(
+            commodity, fetch_config, spreads_config)
             
         print(f"Progress: {i}/{total_commodities} commodities processed")
     
+    # Spreads between commodities once every leg is calculated
+    print("\nCalculating inter-market spreads...")
+    update_inter_market(fetch_config.RAW_DATA_PATH, spreads_config)
+    
     # Print final summary
     print("\nFinal Processing Summary")
     print("=" * 80)
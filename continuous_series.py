@@ -0,0 +1,259 @@
+# continuous_series.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from typing import Dict, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from raw_store import load_raw_data
+from spreads_calculator import apply_dtype_policy
+from spreads_pyramid import get_source_key
+from contract_index import ContractIndex, load_contract_index
+from roll_calendar import load_roll_table, update_roll_table, roll_rule_name
+
+# Back-adjusted continuous series of every month slot, stored per commodity as
+#   processed_data/<COMMODITY>/continuous.parquet
+# with columns month_<N>_difference and month_<N>_ratio. Slot 1 holds the
+# contracts of the stored roll table (SpreadsConfig.ROLL_RULE) and slot N the
+# contract N-1 places after it, so every slot rolls on the roll table's dates.
+# Unlike month_<N> of monthly_futures, MIN_VOLUME and MIN_DAYS_TO_EXPIRY do
+# not move a slot: a contract dropping below them for a day, like a missing
+# quote, leaves a gap instead of a roll. The latest prices are unadjusted;
+# history before each roll is shifted by the gap between the new and the old
+# contract (difference) or scaled by their ratio.
+ADJUSTMENTS = ['difference', 'ratio']
+
+# Rows searched for the quotes of the old and new contract around a roll
+ROLL_QUOTE_ROWS = 5
+
+def get_continuous_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity, 'continuous.parquet')
+
+def held_contracts(index: pd.DatetimeIndex, contract_index: ContractIndex,
+                   n_slots: int, roll_table: pd.DataFrame) -> np.ndarray:
+    """
+    Index position of the contract each slot holds on each date, -1 if
+    none. Slot 1 holds the to_contract of the last roll on or before the
+    date, or the first roll's from_contract before it; without rolls, the
+    front contract of the first date.
+    """
+    if len(roll_table):
+        held = contract_index.positions(
+            [roll_table['from_contract'].iloc[0]] + list(roll_table['to_contract']))
+        rolls = np.searchsorted(pd.DatetimeIndex(roll_table['date']).asi8, index.asi8, side='right')
+        first = held[rolls]
+    else:
+        first = np.repeat(contract_index.first_unexpired(index[:1]), len(index))
+    positions = first[:, None] + np.arange(n_slots)
+    return np.where((first[:, None] >= 0) & (positions < len(contract_index)), positions, -1)
+
+def slot_rolls(positions: np.ndarray) -> pd.DataFrame:
+    """Rows on which one slot's contract changes, with the positions held before and after"""
+    rows = np.flatnonzero((positions[1:] != positions[:-1])
+                          & (positions[:-1] >= 0) & (positions[1:] >= 0)) + 1
+    return pd.DataFrame({
+        'row': rows,
+        'from_position': positions[rows - 1],
+        'to_position': positions[rows]
+    })
+
+def first_quote(quotes: np.ndarray) -> np.ndarray:
+    """First non-NaN value of each row of quotes, NaN if there is none"""
+    found = ~np.isnan(quotes)
+    first = np.argmax(found, axis=1)
+    values = quotes[np.arange(len(quotes)), first] if quotes.size else np.full(len(quotes), np.nan)
+    return np.where(found.any(axis=1), values, np.nan)
+
+def roll_adjustments(old_prices: np.ndarray, new_prices: np.ndarray,
+                     rolls: pd.DataFrame) -> pd.DataFrame:
+    """Gap and ratio between the new and the old contract at each roll"""
+    gap = np.nan_to_num(new_prices - old_prices)
+
+    # Ratios are undefined across zero or negative prices, leave those unadjusted
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where((old_prices > 0) & (new_prices > 0), new_prices / old_prices, 1.0)
+    return rolls.assign(gap=gap, ratio=ratio)
+
+def adjust_slot(slot_prices: np.ndarray, adjustments: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Back-adjust one slot: every row is shifted by the gaps and scaled by
+    the ratios of all rolls after it, from reverse cumulative sums/products.
+    """
+    gaps = np.zeros(len(slot_prices))
+    ratios = np.ones(len(slot_prices))
+    rows = adjustments['row'].to_numpy()
+    gaps[rows] = adjustments['gap'].to_numpy()
+    ratios[rows] = adjustments['ratio'].to_numpy()
+
+    later_gaps = np.append(np.cumsum(gaps[::-1])[::-1][1:], 0.0)
+    later_ratios = np.append(np.cumprod(ratios[::-1])[::-1][1:], 1.0)
+    return {
+        'difference': slot_prices + later_gaps,
+        'ratio': slot_prices * later_ratios
+    }
+
+def build_continuous(monthly_futures: pd.DataFrame, prices_df: pd.DataFrame,
+                     contract_index: ContractIndex, roll_table: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Back-adjusted series of every month slot in monthly_futures from the raw
+    contract prices in prices_df, rolling on the dates of roll_table. At each roll the old contract's last
+    quote before it is compared with the new contract's quote on the row
+    before it, or its first quote after, both within ROLL_QUOTE_ROWS rows.
+    Returns the adjusted frame and the adjustments of every roll.
+    """
+    index = monthly_futures.index
+    slots = [c[:-len('_future')] for c in monthly_futures.columns if c.endswith('_future')]
+    positions = held_contracts(index, contract_index, len(slots), roll_table)
+
+    raw_prices = prices_df.to_numpy(dtype=np.float64)
+    raw_rows = prices_df.index.get_indexer(index)
+    raw_columns = prices_df.columns.get_indexer(contract_index.contracts)
+
+    def quotes(rows: np.ndarray, held: np.ndarray) -> np.ndarray:
+        """Raw price of contract positions held on rows of index, NaN where unknown"""
+        inside = (rows >= 0) & (rows < len(index)) & (held >= 0)
+        raw_row = raw_rows[np.where(inside, rows, 0)]
+        raw_column = raw_columns[np.where(inside, held, 0)]
+        found = inside & (raw_row >= 0) & (raw_column >= 0)
+        return np.where(found, raw_prices[np.where(found, raw_row, 0), np.where(found, raw_column, 0)], np.nan)
+
+    columns = {}
+    all_adjustments = []
+    for i, slot in enumerate(slots):
+        slot_prices = quotes(np.arange(len(index)), positions[:, i])
+        rolls = slot_rolls(positions[:, i])
+
+        # Old contract backwards from the row before the roll, new contract
+        # forwards from the same row
+        rows = rolls['row'].to_numpy()[:, None]
+        before = rows - np.arange(1, ROLL_QUOTE_ROWS + 1)
+        from_before = np.arange(-1, ROLL_QUOTE_ROWS - 1) + rows
+        old_prices = first_quote(quotes(before, np.broadcast_to(
+            rolls['from_position'].to_numpy()[:, None], before.shape)))
+        new_prices = first_quote(quotes(from_before, np.broadcast_to(
+            rolls['to_position'].to_numpy()[:, None], from_before.shape)))
+
+        adjustments = roll_adjustments(old_prices, new_prices, rolls)
+        for method, values in adjust_slot(slot_prices, adjustments).items():
+            columns[f'{slot}_{method}'] = values
+        all_adjustments.append(adjustments.assign(slot=slot))
+
+    return {
+        'series': pd.DataFrame(columns, index=index),
+        'adjustments': pd.concat(all_adjustments, ignore_index=True) if all_adjustments else None
+    }
+
+def roll_records(adjustments: pd.DataFrame, index: pd.DatetimeIndex,
+                 contract_index: ContractIndex) -> pd.DataFrame:
+    """Adjustments of every roll by date and slot, as stored next to the series"""
+    contract_dtype = pd.CategoricalDtype(contract_index.contracts)
+    return pd.DataFrame({
+        'date': index[adjustments['row'].to_numpy()],
+        'slot': adjustments['slot'].to_numpy(),
+        'from_contract': pd.Categorical.from_codes(adjustments['from_position'], dtype=contract_dtype),
+        'to_contract': pd.Categorical.from_codes(adjustments['to_position'], dtype=contract_dtype),
+        'gap': adjustments['gap'].to_numpy(),
+        'ratio': adjustments['ratio'].to_numpy()
+    })
+
+def update_continuous_series(commodity: str, raw_data_path: str,
+                             config: SpreadsConfig) -> Optional[pd.DataFrame]:
+    """
+    Build or extend the continuous series of a commodity. Rows from
+    ROLL_QUOTE_ROWS before the last INCREMENTAL_OVERLAP_DAYS of the previous
+    run are recomputed with their rolls; older rows are shifted by the
+    change in the adjustments of the recomputed rolls. Rolls are read from
+    the stored roll table, updated beforehand by calculate_all_spreads and
+    built here if missing.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    futures_path = os.path.join(spread_path, 'monthly_futures.parquet')
+    continuous_path = get_continuous_path(commodity, config)
+    rolls_path = os.path.join(spread_path, 'continuous_rolls.parquet')
+    info_path = os.path.join(spread_path, 'continuous_info.json')
+    contract_index = load_contract_index(commodity, raw_data_path)
+    if contract_index is None or not os.path.exists(futures_path):
+        return None
+
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+    source = get_source_key(commodity, config)
+    rule = roll_rule_name(config)
+    incremental = (source is not None and info.get('source') == source
+                   and info.get('roll_rule') == rule
+                   and info.get('roll_quote_rows') == ROLL_QUOTE_ROWS
+                   and os.path.exists(continuous_path) and os.path.exists(rolls_path))
+
+    roll_table = load_roll_table(commodity, config)
+    if roll_table is None:
+        roll_table = update_roll_table(commodity, raw_data_path, config)
+
+    monthly_futures = pd.read_parquet(futures_path)
+    first_row = 0
+    recompute_row = 0
+    if incremental and monthly_futures.index.max() >= pd.Timestamp(info['end']):
+        changed_from = pd.Timestamp(info['end']) - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
+        # Rolls whose quotes may have changed, and the rows their old quotes are read from
+        recompute_row = max(0, monthly_futures.index.searchsorted(changed_from) - ROLL_QUOTE_ROWS)
+        first_row = max(0, recompute_row - ROLL_QUOTE_ROWS)
+
+    tail = monthly_futures.iloc[first_row:]
+    prices_df = load_raw_data(commodity, raw_data_path, start_date=tail.index.min())
+    built = build_continuous(tail, prices_df, contract_index, roll_table)
+    series = built['series'].iloc[recompute_row - first_row:]
+    rolls = roll_records(built['adjustments'], tail.index, contract_index)
+    rolls = rolls[rolls['date'] >= series.index.min()]
+
+    if recompute_row > 0:
+        existing = pd.read_parquet(continuous_path)
+        kept = existing[existing.index < series.index.min()].astype(np.float64)
+        stored_rolls = pd.read_parquet(rolls_path)
+        replaced = stored_rolls['date'] >= series.index.min()
+
+        # Kept rows carry the stored adjustments of the recomputed rolls, swap them for the new ones
+        for slot in [c[:-len('_difference')] for c in kept.columns if c.endswith('_difference')]:
+            new_rolls = rolls[rolls['slot'] == slot]
+            old_rolls = stored_rolls[replaced & (stored_rolls['slot'] == slot)]
+            kept[f'{slot}_difference'] += new_rolls['gap'].sum() - old_rolls['gap'].sum()
+            kept[f'{slot}_ratio'] *= new_rolls['ratio'].prod() / old_rolls['ratio'].prod()
+        series = pd.concat([kept, series])
+        rolls = pd.concat([stored_rolls[~replaced], rolls], ignore_index=True)
+
+    series = apply_dtype_policy(series, config)
+    series.to_parquet(continuous_path)
+    rolls.sort_values('date', kind='stable', ignore_index=True).to_parquet(rolls_path)
+    with open(info_path, 'w') as f:
+        json.dump({'source': source, 'end': series.index.max().isoformat(),
+                   'adjustments': ADJUSTMENTS, 'roll_rule': rule,
+                   'roll_quote_rows': ROLL_QUOTE_ROWS}, f, indent=2)
+    print(f"Updated {commodity} continuous series: {len(series) - recompute_row} rows recomputed, "
+          f"{len(rolls)} rolls")
+    return series
+
+def load_continuous(commodity: str, config: SpreadsConfig, month: int = 1,
+                    adjustment: str = 'difference') -> Optional[pd.Series]:
+    """Continuous series of one month slot, None if it has not been built"""
+    if adjustment not in ADJUSTMENTS:
+        raise ValueError(f"Unknown adjustment {adjustment}, expected one of {ADJUSTMENTS}")
+    path = get_continuous_path(commodity, config)
+    if not os.path.exists(path):
+        return None
+    column = f'month_{month}_{adjustment}'
+    return pd.read_parquet(path, columns=[column])[column]
+
+def main():
+    """Build the continuous series of all commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        if update_continuous_series(commodity, fetch_config.RAW_DATA_PATH, config) is None:
+            print(f"No spread data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# contract_index.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+def to_day_numbers(dates) -> np.ndarray:
+    """Convert dates to int64 day numbers since the epoch"""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return dates.values.astype('datetime64[D]').astype(np.int64)
+
+def metadata_last_trade_date(info) -> Optional[str]:
+    """Last trade date stored for one contract, None for malformed entries"""
+    return info.get('last_trade_date') if isinstance(info, dict) else None
+
+class ContractIndex:
+    """
+    Contracts of one commodity sorted by last trade date; contracts with
+    the same last trade date keep their input order.
+    Expiry lookups for many dates at once are binary searches on the sorted
+    int64 day array instead of scans over every contract.
+    """
+
+    def __init__(self, contracts: Sequence[str], expiry_days: Sequence[int]):
+        contracts = np.asarray(contracts, dtype=str)
+        expiry_days = np.asarray(expiry_days, dtype=np.int64)
+
+        order = np.argsort(expiry_days, kind='stable')
+        self.contracts = contracts[order].astype(object)
+        self.expiry_days = expiry_days[order]
+        self._positions = {c: i for i, c in enumerate(self.contracts)}
+
+    @classmethod
+    def from_last_trade_dates(cls, last_trade_dates: Dict[str, datetime]) -> 'ContractIndex':
+        """Build index from a contract -> last trade date mapping"""
+        dates = pd.to_datetime(pd.Series(last_trade_dates, dtype=object), errors='coerce')
+        dates = dates[dates.notna()]
+        return cls(dates.index.tolist(), to_day_numbers(dates))
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict) -> 'ContractIndex':
+        """Build index from the LAST_TRADEABLE_DT values stored in metadata"""
+        return cls.from_last_trade_dates({
+            contract: metadata_last_trade_date(info) for contract, info in metadata.items()
+        })
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    @property
+    def expiry_dates(self) -> pd.DatetimeIndex:
+        """Last trade dates in index order"""
+        return pd.DatetimeIndex(self.expiry_days.astype('datetime64[D]'))
+
+    def last_trade_dates(self) -> Dict[str, datetime]:
+        """Contract -> last trade date mapping"""
+        return dict(zip(self.contracts, self.expiry_dates))
+
+    def positions(self, contracts: Sequence[str]) -> np.ndarray:
+        """Index position of each contract, -1 for contracts without expiry"""
+        return np.array([self._positions.get(c, -1) for c in contracts], dtype=np.int64)
+
+    def first_unexpired(self, dates) -> np.ndarray:
+        """Position of the first contract not yet expired on each date"""
+        return np.searchsorted(self.expiry_days, to_day_numbers(dates), side='left')
+
+    def nth_contract(self, dates, month: int = 1) -> np.ndarray:
+        """Position of the month-th unexpired contract on each date, -1 if none"""
+        positions = self.first_unexpired(dates) + month - 1
+        return np.where(positions < len(self), positions, -1)
+
+    def front_contracts(self, dates, month: int = 1) -> np.ndarray:
+        """Ticker of the month-th unexpired contract on each date"""
+        positions = self.nth_contract(dates, month)
+        contracts = np.append(self.contracts, np.nan)
+        return contracts[positions]
+
+    def days_to_expiry(self, dates, month: int = 1) -> np.ndarray:
+        """Days to expiry of the month-th unexpired contract on each date"""
+        positions = self.nth_contract(dates, month)
+        days = self.expiry_days[positions] - to_day_numbers(dates)
+        return np.where(positions >= 0, days, np.nan)
+
+    def contracts_on(self, date: datetime, min_days: int = 0) -> Dict[str, int]:
+        """Days to expiry of every contract with at least min_days left on date"""
+        day = to_day_numbers([date])[0]
+        start = np.searchsorted(self.expiry_days, day + min_days, side='left')
+        return dict(zip(self.contracts[start:], (self.expiry_days[start:] - day).tolist()))
+
+    def roll_dates(self, dates) -> List[datetime]:
+        """Dates on which the first unexpired contract changes, the first date excluded"""
+        dates = pd.DatetimeIndex(dates)
+        first = self.first_unexpired(dates)
+        changed = np.zeros(len(first), dtype=bool)
+        changed[1:] = first[1:] != first[:-1]
+        return list(dates[changed & (first < len(self))])
+
+def load_contract_index(commodity: str, raw_data_path: str) -> Optional[ContractIndex]:
+    """Load contract index from a commodity's stored metadata"""
+    metadata_path = os.path.join(raw_data_path, commodity, 'metadata.json')
+    if not os.path.exists(metadata_path):
+        return None
+
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    return ContractIndex.from_metadata(metadata)
@@ -1,12 +1,32 @@
-import blpapi
+from __future__ import annotations
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
 import json
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable
+from collections import deque
+from itertools import count
+from array import array
 import math
 from fetch_config import FetchConfig
+from contract_index import ContractIndex, metadata_last_trade_date
+from bloomberg_replay import (RecordingSession, ReplaySession, ReplayEventQueue,
+                              EventType, CorrelationId, open_replay_session)
+from raw_store import raw_data_exists, load_raw_data, save_raw_data, get_raw_data_summary
+
+try:
+    import blpapi
+except ImportError:
+    # Without the Bloomberg SDK only replayed sessions are available
+    blpapi = None
+
+# Proleptic ordinal of 1970-01-01, converts date.toordinal() to epoch days
+EPOCH_ORDINAL = 719163
+
+# Correlation IDs are unique per process so fetches can share a session
+CORRELATION_IDS = count(1)
 
 def verify_data_integrity(prices_df: pd.DataFrame, volumes_df: pd.DataFrame) -> bool:
     """Verify data integrity after fetch/update"""
@@ -38,7 +58,17 @@ def verify_data_integrity(prices_df: pd.DataFrame, volumes_df: pd.DataFrame) ->
         return False
 
 def start_bloomberg_session(config: FetchConfig) -> blpapi.Session:
-    """Initialize Bloomberg API session"""
+    """
+    Initialize Bloomberg API session.
+    Returns a replay session if REPLAY_PATH is set, and wraps the live session
+    in a recorder if RECORD_PATH is set.
+    """
+    if config.REPLAY_PATH:
+        return open_replay_session(config.REPLAY_PATH, config.REPLAY_LATENCY,
+                                   config.REPLAY_FRAGMENT_SIZE)
+    
+    if blpapi is None:
+        raise ImportError("A live Bloomberg session requires blpapi, set REPLAY_PATH to replay a recording")
     session_options = blpapi.SessionOptions()
     session_options.setServerHost(config.BLOOMBERG_HOST)
     session_options.setServerPort(config.BLOOMBERG_PORT)
@@ -48,17 +78,55 @@ def start_bloomberg_session(config: FetchConfig) -> blpapi.Session:
         raise Exception("Failed to start session.")
     if not session.openService("//blp/refdata"):
         raise Exception("Failed to open service")
+    if config.RECORD_PATH:
+        return RecordingSession(session, config.RECORD_PATH)
     return session
 
+class SharedSessionView:
+    """
+    Per-thread view of a shared session. Requests are sent on the shared
+    session but their events go to a private queue, so several fetches can
+    run their own nextEvent loops concurrently.
+    """
+    
+    def __init__(self, session: blpapi.Session):
+        self.session = session
+        if isinstance(session, ReplaySession):
+            self.event_queue = ReplayEventQueue()
+        else:
+            self.event_queue = blpapi.EventQueue()
+    
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+    
+    def sendRequest(self, request, identity=None, correlationId=None,
+                    eventQueue=None, requestLabel=''):
+        return self.session.sendRequest(request, identity=identity,
+                                        correlationId=correlationId,
+                                        eventQueue=self.event_queue,
+                                        requestLabel=requestLabel)
+    
+    def nextEvent(self, timeout: int = 0):
+        event = self.event_queue.nextEvent(timeout)
+        if isinstance(self.session, RecordingSession):
+            self.session.record_event(event)
+        return event
+    
+    def stop(self):
+        """The shared session is stopped by its owner"""
+        return True
+
 def check_existing_data(commodity: str, config: FetchConfig) -> Tuple[Optional[datetime], Optional[Dict]]:
-    """Check if we have existing data and return the last date and metadata"""
+    """
+    Check if we have existing data and return the last date and metadata.
+    Reads the raw data manifest only, not the data itself.
+    """
     commodity_path = os.path.join(config.RAW_DATA_PATH, commodity)
-    prices_path = os.path.join(commodity_path, 'prices.parquet')
     
-    if os.path.exists(prices_path):
+    if raw_data_exists(commodity, config.RAW_DATA_PATH):
         try:
-            prices_df = pd.read_parquet(prices_path)
-            last_date = prices_df.index.max()
+            summary = get_raw_data_summary(commodity, config.RAW_DATA_PATH)
+            last_date = pd.Timestamp(summary['end_date'])
             
             metadata_path = os.path.join(commodity_path, 'metadata.json')
             existing_metadata = {}
@@ -67,7 +135,7 @@ def check_existing_data(commodity: str, config: FetchConfig) -> Tuple[Optional[d
                     existing_metadata = json.load(f)
             
             print(f"Found existing data for {commodity} up to {last_date.date()}")
-            print(f"Number of contracts: {len(prices_df.columns)}")
+            print(f"Number of contracts: {summary['contracts_count']}")
             return last_date, existing_metadata
             
         except Exception as e:
@@ -86,86 +154,253 @@ def generate_futures_tickers(commodity: str, config: FetchConfig) -> List[str]:
     print(f"Generated {len(tickers)} tickers for {commodity}")
     return tickers
 
+def send_requests(session: blpapi.Session, requests: List[blpapi.Request],
+                  handle_message: Callable[[int, blpapi.Message], None],
+                  max_in_flight: int = 1, label: str = "request") -> List[int]:
+    """
+    Send requests keeping up to max_in_flight of them outstanding at once.
+    Each request is tagged with a unique CorrelationId so partial and final
+    responses are routed to handle_message(position, msg).
+    Returns the positions of requests that failed.
+    """
+    pending = deque(range(len(requests)))
+    in_flight = set()
+    request_ids = {}
+    failed = []
+    completed = 0
+    
+    def send_next():
+        while pending and len(in_flight) < max(1, max_in_flight):
+            request_id = pending.popleft()
+            correlation_value = next(CORRELATION_IDS)
+            request_ids[correlation_value] = request_id
+            try:
+                session.sendRequest(requests[request_id],
+                                    correlationId=CorrelationId(correlation_value))
+                in_flight.add(request_id)
+            except Exception as e:
+                print(f"Error sending {label} batch {request_id + 1}: {e}")
+                failed.append(request_id)
+    
+    send_next()
+    while in_flight:
+        event = session.nextEvent(500)
+        event_type = event.eventType()
+        if event_type not in [EventType.PARTIAL_RESPONSE, EventType.RESPONSE,
+                              EventType.REQUEST_STATUS]:
+            continue
+            
+        # A request is finished once every message of its final event is handled
+        finished = set()
+        for msg in event:
+            for correlation_id in msg.correlationIds():
+                request_id = request_ids.get(correlation_id.value())
+                if request_id not in in_flight:
+                    continue
+                    
+                if event_type == EventType.REQUEST_STATUS:
+                    print(f"{label.capitalize()} batch {request_id + 1} failed: {msg}")
+                    if request_id not in failed:
+                        failed.append(request_id)
+                    finished.add(request_id)
+                    continue
+                
+                try:
+                    handle_message(request_id, msg)
+                except Exception as e:
+                    print(f"Error processing {label} batch {request_id + 1}: {e}")
+                    if request_id not in failed:
+                        failed.append(request_id)
+                
+                if event_type == EventType.RESPONSE:
+                    finished.add(request_id)
+        
+        for request_id in finished:
+            in_flight.discard(request_id)
+            if request_id not in failed:
+                completed += 1
+                print(f"Completed {label} batch {completed}/{len(requests)}")
+        
+        send_next()
+    
+    return failed
+
+def get_tickers_to_probe(tickers: List[str], metadata: Dict,
+                         config: FetchConfig) -> List[str]:
+    """
+    Tickers whose expiry is unknown: never seen before, or seen without a
+    last trade date and not probed within EXPIRY_REPROBE_DAYS.
+    """
+    reprobe_before = datetime.now() - timedelta(days=config.EXPIRY_REPROBE_DAYS)
+    probe = []
+    for ticker in tickers:
+        info = metadata.get(ticker)
+        if not metadata_last_trade_date(info):
+            # Missing and malformed entries count as never probed
+            probed = info.get('expiry_probed') if isinstance(info, dict) else None
+            if probed is None or datetime.fromisoformat(probed) < reprobe_before:
+                probe.append(ticker)
+    return probe
+
+def mark_probed_tickers(tickers: List[str], metadata: Dict):
+    """Record probe date for tickers that still have no last trade date"""
+    probed = datetime.now().isoformat()
+    for ticker in tickers:
+        info = metadata.get(ticker)
+        if not isinstance(info, dict):
+            # Replace malformed entries so the probe date can be recorded
+            info = metadata[ticker] = {'name': ticker, 'units': '', 'last_trade_date': ''}
+        if not info.get('last_trade_date'):
+            info['expiry_probed'] = probed
+
+def prune_expired_tickers(tickers: List[str], metadata: Dict, 
+                          start_date: datetime) -> List[str]:
+    """Keep only tickers whose last trade date is on or after start_date"""
+    live_contracts = ContractIndex.from_metadata(metadata).contracts_on(start_date)
+    pruned = [t for t in tickers if t in live_contracts]
+    print(f"Pruned {len(tickers) - len(pruned)} expired or unknown contracts, "
+          f"{len(pruned)} remaining")
+    return pruned
+
 def fetch_metadata(session: blpapi.Session, tickers: List[str], 
                   config: FetchConfig) -> Dict:
     """Fetch metadata for all tickers in batches"""
-    metadata = {}
     batches = np.array_split(tickers, math.ceil(len(tickers)/config.BATCH_SIZE))
-    
-    for i, batch in enumerate(batches, 1):
-        print(f"Processing metadata batch {i}/{len(batches)}")
-        batch_metadata = fetch_metadata_batch(session, batch)
-        metadata.update(batch_metadata)
-    
-    return metadata
+    print(f"Fetching metadata in {len(batches)} batches "
+          f"({config.MAX_IN_FLIGHT_REQUESTS} in flight)")
+    return fetch_metadata_batches(session, batches, config.MAX_IN_FLIGHT_REQUESTS)
 
 def fetch_metadata_batch(session: blpapi.Session, securities_batch: List[str]) -> Dict:
     """Fetch metadata for a batch of securities"""
+    return fetch_metadata_batches(session, [securities_batch])
+
+def create_metadata_request(session: blpapi.Session, securities_batch: List[str]) -> blpapi.Request:
+    """Build ReferenceDataRequest for a batch of securities"""
     refDataService = session.getService("//blp/refdata")
+    request = refDataService.createRequest("ReferenceDataRequest")
+    for security in securities_batch:
+        request.append("securities", security)
+    request.append("fields", "name")
+    request.append("fields", "QUOTE_UNITS")
+    request.append("fields", "LAST_TRADEABLE_DT")
+    return request
+
+def parse_metadata_message(msg: blpapi.Message, metadata: Dict):
+    """Add metadata of every security in a reference data message"""
+    securityDataArray = msg.getElement("securityData")
+    for i in range(securityDataArray.numValues()):
+        securityData = securityDataArray.getValueAsElement(i)
+        ticker = securityData.getElementAsString("security")
+        fieldData = securityData.getElement("fieldData")
+        
+        metadata[ticker] = {
+            'name': fieldData.getElementAsString("name") if fieldData.hasElement("name") else ticker,
+            'units': fieldData.getElementAsString("QUOTE_UNITS") if fieldData.hasElement("QUOTE_UNITS") else '',
+            'last_trade_date': fieldData.getElementAsString("LAST_TRADEABLE_DT") if fieldData.hasElement("LAST_TRADEABLE_DT") else ''
+        }
+
+def fetch_metadata_batches(session: blpapi.Session, batches: List[List[str]],
+                           max_in_flight: int = 1) -> Dict:
+    """Fetch metadata for several batches with concurrent requests"""
     metadata = {}
     
     try:
-        request = refDataService.createRequest("ReferenceDataRequest")
-        for security in securities_batch:
-            request.append("securities", security)
-        request.append("fields", "name")
-        request.append("fields", "QUOTE_UNITS")
-        request.append("fields", "LAST_TRADEABLE_DT")
-        
-        session.sendRequest(request)
-        end_reached = False
-        
-        while not end_reached:
-            event = session.nextEvent(500)
-            if event.eventType() in [blpapi.Event.PARTIAL_RESPONSE, 
-                                   blpapi.Event.RESPONSE]:
-                for msg in event:
-                    securityDataArray = msg.getElement("securityData")
-                    for i in range(securityDataArray.numValues()):
-                        securityData = securityDataArray.getValueAsElement(i)
-                        ticker = securityData.getElementAsString("security")
-                        fieldData = securityData.getElement("fieldData")
-                        
-                        metadata[ticker] = {
-                            'name': fieldData.getElementAsString("name") if fieldData.hasElement("name") else ticker,
-                            'units': fieldData.getElementAsString("QUOTE_UNITS") if fieldData.hasElement("QUOTE_UNITS") else '',
-                            'last_trade_date': fieldData.getElementAsString("LAST_TRADEABLE_DT") if fieldData.hasElement("LAST_TRADEABLE_DT") else ''
-                        }
-            
-            if event.eventType() == blpapi.Event.RESPONSE:
-                end_reached = True
-                
+        requests = [create_metadata_request(session, batch) for batch in batches]
+        send_requests(session, requests,
+                      lambda request_id, msg: parse_metadata_message(msg, metadata),
+                      max_in_flight, label="metadata")
     except Exception as e:
         print(f"Error fetching metadata batch: {e}")
         
     return metadata
 
+class PriceVolumeAccumulator:
+    """
+    Collects historical data responses into per-security typed arrays and
+    builds one frame per field once all responses are in.
+    """
+    
+    def __init__(self, fields: List[str]):
+        self.fields = list(fields)
+        self._dates = {}
+        self._values = {}
+    
+    def add_message(self, msg: blpapi.Message):
+        """Append the rows of one security's historical data message"""
+        securityData = msg.getElement("securityData")
+        security_name = securityData.getElementAsString("security")
+        fieldDataArray = securityData.getElement("fieldData")
+        
+        dates = self._dates.setdefault(security_name, array('q'))
+        values = self._values.setdefault(
+            security_name, {field: array('d') for field in self.fields})
+        
+        for i in range(fieldDataArray.numValues()):
+            fieldData = fieldDataArray.getValueAsElement(i)
+            dates.append(fieldData.getElementAsDatetime("date").toordinal())
+            for field in self.fields:
+                values[field].append(fieldData.getElementAsFloat(field)
+                                     if fieldData.hasElement(field) else np.nan)
+    
+    def discard(self, securities: List[str]):
+        """Drop everything received for the given securities"""
+        for security in securities:
+            self._dates.pop(security, None)
+            self._values.pop(security, None)
+    
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        """One date x security frame per field, securities in sorted order"""
+        securities = sorted(s for s in self._dates if len(self._dates[s]))
+        if not securities:
+            return {field: pd.DataFrame() for field in self.fields}
+        
+        security_dates = [np.frombuffer(self._dates[s], dtype=np.int64) for s in securities]
+        all_dates = np.unique(np.concatenate(security_dates))
+        index = pd.DatetimeIndex(
+            (all_dates - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[ns]'))
+        
+        frames = {}
+        for field in self.fields:
+            matrix = np.full((len(all_dates), len(securities)), np.nan)
+            for j, (security, dates) in enumerate(zip(securities, security_dates)):
+                rows = np.searchsorted(all_dates, dates)
+                matrix[rows, j] = np.frombuffer(self._values[security][field], dtype=np.float64)
+            
+            # Only securities that returned this field at least once
+            has_data = ~np.isnan(matrix).all(axis=0)
+            frames[field] = pd.DataFrame(matrix[:, has_data], index=index,
+                                         columns=[s for s, h in zip(securities, has_data) if h])
+        return frames
+
 def fetch_price_volume_data(session: blpapi.Session, tickers: List[str],
                           start_date: datetime, end_date: datetime,
-                          config: FetchConfig) -> pd.DataFrame:
+                          config: FetchConfig) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Fetch price and volume data for all tickers in batches"""
-    all_data = pd.DataFrame()
     batches = np.array_split(tickers, math.ceil(len(tickers)/config.BATCH_SIZE))
+    print(f"Fetching price/volume data in {len(batches)} batches "
+          f"({config.MAX_IN_FLIGHT_REQUESTS} in flight)")
     
-    for i, batch in enumerate(batches, 1):
-        print(f"Processing price/volume batch {i}/{len(batches)}")
-        batch_data = fetch_price_volume_batch(
-            session, batch, config.DEFAULT_FIELDS, start_date, end_date)
-        
-        if not batch_data.empty:
-            if all_data.empty:
-                all_data = batch_data
-            else:
-                new_cols = [col for col in batch_data.columns if col not in all_data.columns]
-                if new_cols:
-                    all_data = pd.concat([all_data, batch_data[new_cols]], axis=1)
-    
-    return all_data
+    accumulator = fetch_price_volume_batches(
+        session, batches, config.DEFAULT_FIELDS, start_date, end_date,
+        config.MAX_IN_FLIGHT_REQUESTS)
+    
+    frames = accumulator.to_frames()
+    prices_df, volumes_df = frames['PX_LAST'], frames['PX_VOLUME']
+    print(f"Found {len(prices_df.columns)} price series and {len(volumes_df.columns)} volume series")
+    
+    return prices_df, volumes_df
 
 def fetch_price_volume_batch(session: blpapi.Session, securities_batch: List[str],
                            fields: List[str], start_date: datetime, 
-                           end_date: datetime) -> pd.DataFrame:
-    """Fetch historical data for a batch of securities"""
+                           end_date: datetime) -> Dict[str, pd.DataFrame]:
+    """Fetch historical data for a batch of securities, one frame per field"""
+    return fetch_price_volume_batches(
+        session, [securities_batch], fields, start_date, end_date).to_frames()
+
+def create_price_volume_request(session: blpapi.Session, securities_batch: List[str],
+                                fields: List[str], start_date: datetime,
+                                end_date: datetime) -> blpapi.Request:
+    """Build HistoricalDataRequest for a batch of securities"""
     refDataService = session.getService("//blp/refdata")
     
     request = refDataService.createRequest("HistoricalDataRequest")
@@ -178,82 +413,46 @@ def fetch_price_volume_batch(session: blpapi.Session, securities_batch: List[str
     request.set("endDate", end_date.strftime("%Y%m%d"))
     request.set("periodicityAdjustment", "ACTUAL")
     request.set("periodicitySelection", "DAILY")
-    
-    data_dict = {}
+    return request
+
+def fetch_price_volume_batches(session: blpapi.Session, batches: List[List[str]],
+                               fields: List[str], start_date: datetime,
+                               end_date: datetime, max_in_flight: int = 1) -> PriceVolumeAccumulator:
+    """Fetch historical data for several batches with concurrent requests"""
+    accumulator = PriceVolumeAccumulator(fields)
     
     try:
-        session.sendRequest(request)
-        end_reached = False
+        requests = [create_price_volume_request(session, batch, fields, start_date, end_date)
+                    for batch in batches]
+        failed = send_requests(
+            session, requests,
+            lambda request_id, msg: accumulator.add_message(msg),
+            max_in_flight, label="price/volume")
         
-        while not end_reached:
-            event = session.nextEvent(500)
-            if event.eventType() in [blpapi.Event.PARTIAL_RESPONSE, 
-                                   blpapi.Event.RESPONSE]:
-                for msg in event:
-                    securityData = msg.getElement("securityData")
-                    security_name = securityData.getElementAsString("security")
-                    fieldDataArray = securityData.getElement("fieldData")
-                    
-                    for i in range(fieldDataArray.numValues()):
-                        fieldData = fieldDataArray.getValueAsElement(i)
-                        date = fieldData.getElementAsDatetime("date")
-                        
-                        if date not in data_dict:
-                            data_dict[date] = {}
-                        
-                        for field in fields:
-                            if fieldData.hasElement(field):
-                                data_dict[date][f"{security_name}_{field}"] = fieldData.getElementAsFloat(field)
-            
-            if event.eventType() == blpapi.Event.RESPONSE:
-                end_reached = True
-                
+        # Incomplete batches are dropped entirely
+        for request_id in failed:
+            accumulator.discard(list(batches[request_id]))
     except Exception as e:
         print(f"Error fetching batch data: {e}")
-        return pd.DataFrame()
-    
-    if data_dict:
-        df = pd.DataFrame.from_dict(data_dict, orient='index')
-        df.index = pd.to_datetime(df.index)
-        df.sort_index(inplace=True)
-        return df
+        return PriceVolumeAccumulator(fields)
     
-    return pd.DataFrame()
-
-def process_price_volume_data(raw_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Split raw data into separate price and volume dataframes"""
-    price_cols = [col for col in raw_data.columns if 'PX_LAST' in col]
-    volume_cols = [col for col in raw_data.columns if 'PX_VOLUME' in col]
-    
-    print(f"Found {len(price_cols)} price series and {len(volume_cols)} volume series")
-    
-    # Create separate dataframes
-    prices_df = raw_data[price_cols].copy()
-    volumes_df = raw_data[volume_cols].copy()
-    
-    # Clean up column names
-    prices_df.columns = [col.replace('_PX_LAST', '') for col in prices_df.columns]
-    volumes_df.columns = [col.replace('_PX_VOLUME', '') for col in volumes_df.columns]
-    
-    # Sort columns
-    prices_df = prices_df.reindex(sorted(prices_df.columns), axis=1)
-    volumes_df = volumes_df.reindex(sorted(volumes_df.columns), axis=1)
-    
-    return prices_df, volumes_df
+    return accumulator
 
 def merge_with_existing(commodity: str, new_prices: pd.DataFrame, new_volumes: pd.DataFrame, 
                        last_date: datetime, config: FetchConfig) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Merge new data with existing data"""
+    """Merge new data with the existing data of the years it touches"""
     print(f"Merging new data with existing data...")
-    commodity_path = os.path.join(config.RAW_DATA_PATH, commodity)
-    
-    # Load existing data
-    existing_prices = pd.read_parquet(os.path.join(commodity_path, 'prices.parquet'))
-    existing_volumes = pd.read_parquet(os.path.join(commodity_path, 'volumes.parquet'))
     
     # For the overlap period, prefer new data
     cutoff_date = last_date - timedelta(days=config.LOOKBACK_DAYS)
     
+    # Load existing data of the year partitions that will be rewritten
+    partition_start = datetime(cutoff_date.year, 1, 1)
+    existing_prices = load_raw_data(commodity, config.RAW_DATA_PATH, 'prices',
+                                    start_date=partition_start)
+    existing_volumes = load_raw_data(commodity, config.RAW_DATA_PATH, 'volumes',
+                                     start_date=partition_start)
+    
     # Combine old and new data
     merged_prices = pd.concat([
         existing_prices[existing_prices.index <= cutoff_date],
@@ -275,13 +474,13 @@ def merge_with_existing(commodity: str, new_prices: pd.DataFrame, new_volumes: p
 def save_commodity_data(commodity: str, prices_df: pd.DataFrame, 
                        volumes_df: pd.DataFrame, metadata: Dict, 
                        config: FetchConfig):
-    """Save commodity data to disk"""
+    """Save commodity data to disk, rewriting only the years in prices_df"""
     commodity_path = os.path.join(config.RAW_DATA_PATH, commodity)
     os.makedirs(commodity_path, exist_ok=True)
     
-    # Save data files
-    prices_df.to_parquet(os.path.join(commodity_path, 'prices.parquet'))
-    volumes_df.to_parquet(os.path.join(commodity_path, 'volumes.parquet'))
+    # Save data files, only the year partitions covered by the frames
+    save_raw_data(commodity, config.RAW_DATA_PATH, prices_df, volumes_df)
+    summary = get_raw_data_summary(commodity, config.RAW_DATA_PATH)
     
     # Save metadata
     with open(os.path.join(commodity_path, 'metadata.json'), 'w') as f:
@@ -291,23 +490,26 @@ def save_commodity_data(commodity: str, prices_df: pd.DataFrame,
     with open(os.path.join(commodity_path, 'config.json'), 'w') as f:
         json.dump({
             'last_update': datetime.now().isoformat(),
-            'start_date': prices_df.index.min().isoformat(),
-            'end_date': prices_df.index.max().isoformat(),
-            'number_of_contracts': len(prices_df.columns),
+            'start_date': summary['start_date'],
+            'end_date': summary['end_date'],
+            'number_of_contracts': summary['contracts_count'],
             'data_fields': config.DEFAULT_FIELDS,
             'data_statistics': {
-                'trading_days': len(prices_df),
-                'completeness': float(1 - prices_df.isna().mean().mean()),
-                'contracts_count': len(prices_df.columns)
+                'trading_days': summary['trading_days'],
+                'completeness': summary['completeness'],
+                'contracts_count': summary['contracts_count']
             }
         }, f, indent=2)
     
     print(f"Data saved to {commodity_path}")
 
-def fetch_commodity_data(commodity: str, config: FetchConfig) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+def fetch_commodity_data(commodity: str, config: FetchConfig,
+                         session: Optional[blpapi.Session] = None) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
     """
     Main function to fetch/update commodity data.
-    Only fetches new data if existing data is found.
+    Only fetches new data if existing data is found. On updates the returned
+    frames hold the rewritten years only; use raw_store.load_raw_data for
+    the full history. A given session is used as is and left running.
     """
     print(f"\nProcessing {commodity}...")
     
@@ -323,34 +525,42 @@ def fetch_commodity_data(commodity: str, config: FetchConfig) -> Tuple[pd.DataFr
         start_date = datetime(config.START_YEAR, 1, 1)
         print(f"Will fetch full history from {start_date.date()} to {end_date.date()}")
     
-    session = start_bloomberg_session(config)
+    owns_session = session is None
+    if owns_session:
+        session = start_bloomberg_session(config)
     try:
         # Generate tickers
         tickers = generate_futures_tickers(commodity, config)
         
-        # Fetch metadata only for new contracts
+        # Fetch metadata only for contracts with unknown expiry
         if existing_metadata:
-            new_tickers = [t for t in tickers if t not in existing_metadata]
+            new_tickers = get_tickers_to_probe(tickers, existing_metadata, config)
             if new_tickers:
                 print(f"Fetching metadata for {len(new_tickers)} new contracts...")
                 new_metadata = fetch_metadata(session, new_tickers, config)
                 existing_metadata.update(new_metadata)
+                mark_probed_tickers(new_tickers, existing_metadata)
             metadata = existing_metadata
         else:
             print("Fetching metadata for all contracts...")
             metadata = fetch_metadata(session, tickers, config)
+            mark_probed_tickers(tickers, metadata)
+        
+        # Skip contracts that expired before the update window
+        if config.PRUNE_EXPIRED_TICKERS:
+            tickers = prune_expired_tickers(tickers, metadata, start_date)
         
         # Fetch price and volume data
         print("Fetching price and volume data...")
-        raw_data = fetch_price_volume_data(session, tickers, start_date, end_date, config)
+        prices_df, volumes_df = pd.DataFrame(), pd.DataFrame()
+        if tickers:
+            prices_df, volumes_df = fetch_price_volume_data(
+                session, tickers, start_date, end_date, config)
         
-        if raw_data.empty:
+        if prices_df.empty:
             print("No new data retrieved")
             return pd.DataFrame(), pd.DataFrame(), metadata
         
-        # Process into prices and volumes
-        prices_df, volumes_df = process_price_volume_data(raw_data)
-        
         # If we have existing data, merge with new data
         if last_date is not None:
             prices_df, volumes_df = merge_with_existing(
@@ -366,16 +576,18 @@ def fetch_commodity_data(commodity: str, config: FetchConfig) -> Tuple[pd.DataFr
         save_commodity_data(commodity, prices_df, volumes_df, metadata, config)
         
         # Print summary
+        summary = get_raw_data_summary(commodity, config.RAW_DATA_PATH)
         print(f"\nProcessing complete for {commodity}")
-        print(f"Date range: {prices_df.index.min().date()} to {prices_df.index.max().date()}")
-        print(f"Number of contracts: {len(prices_df.columns)}")
-        print(f"Number of trading days: {len(prices_df)}")
-        print(f"Data completeness: {(1 - prices_df.isna().mean().mean()) * 100:.2f}%")
+        print(f"Date range: {summary['start_date'][:10]} to {summary['end_date'][:10]}")
+        print(f"Number of contracts: {summary['contracts_count']}")
+        print(f"Number of trading days: {summary['trading_days']}")
+        print(f"Data completeness: {summary['completeness'] * 100:.2f}%")
         
         return prices_df, volumes_df, metadata
         
     finally:
-        session.stop()
+        if owns_session:
+            session.stop()
 
 def main():
     """Example usage"""
@@ -1,14 +1,167 @@
 # export_for_github.py
 
 import pandas as pd
+import numpy as np
 import os
 import json
+import gzip
+import hashlib
 from datetime import datetime
 from fetch_config import FetchConfig
 from spreads_config import SpreadsConfig
+from spreads_pyramid import PYRAMID_LEVELS, AGGREGATIONS, load_pyramid_level
+from roll_calendar import load_roll_table, roll_rule_name
+from inter_market import INTER_MARKET_NAME, INTER_MARKET_FILES, update_inter_market
+from typing import Optional, Tuple
 
-def export_spreads_to_json(commodity: str, configs: tuple):
-    """Export spread data to JSON format for GitHub"""
+try:
+    import brotli
+except ImportError:  # .br files are skipped without the brotli package
+    brotli = None
+
+# Column-oriented yearly chunks, see export_spreads_to_json
+EXPORT_FORMAT = 'columnar-v1'
+EXPORT_ENCODINGS = ['json', 'gz'] + (['br'] if brotli is not None else [])
+ENCODING_SUFFIXES = {'json': '', 'gz': '.gz', 'br': '.br'}
+
+# Decimal places kept per spread type
+EXPORT_PRECISION = {
+    'dollar': 4,
+    'percent': 6,
+    'annual': 6,
+    'constant_maturity': 6,
+    'inter_market': 6
+}
+
+# Map of spread types to files
+SPREAD_FILES = {
+    'dollar': 'spreads_dollar.parquet',
+    'percent': 'spreads_percent.parquet',
+    'annual': 'spreads_annual.parquet',
+    'constant_maturity': 'constant_maturity.parquet'
+}
+
+def to_columnar(df: pd.DataFrame, precision: int) -> dict:
+    """Dates once and one rounded value array per column, NaN as null"""
+    columns = {}
+    for column in df.columns:
+        values = np.round(df[column].to_numpy(dtype=np.float64), precision)
+        columns[column] = [None if np.isnan(v) else v for v in values.tolist()]
+    return {
+        'dates': df.index.strftime('%Y-%m-%d').tolist(),
+        'columns': columns
+    }
+
+def write_compressed(path: str, payload: bytes) -> dict:
+    """Write payload with precompressed .gz and, if available, .br siblings"""
+    sizes = {'json': len(payload)}
+    with open(path, 'wb') as f:
+        f.write(payload)
+    
+    # mtime=0 keeps the gzip output identical for identical payloads
+    compressed = gzip.compress(payload, compresslevel=9, mtime=0)
+    with open(path + '.gz', 'wb') as f:
+        f.write(compressed)
+    sizes['gz'] = len(compressed)
+    
+    if brotli is not None:
+        compressed = brotli.compress(payload, quality=11)
+        with open(path + '.br', 'wb') as f:
+            f.write(compressed)
+        sizes['br'] = len(compressed)
+    return sizes
+
+def content_hash(df: pd.DataFrame, precision: int) -> str:
+    """Hash of the exported content of a chunk, computed without serializing it"""
+    h = hashlib.sha256(f'{EXPORT_FORMAT}:{precision}'.encode())
+    h.update(df.index.values.astype('datetime64[D]').tobytes())
+    for column in df.columns:
+        values = np.round(df[column].to_numpy(dtype=np.float64), precision)
+        h.update(str(column).encode())
+        h.update(np.where(np.isnan(values), np.nan, values).tobytes())
+    return h.hexdigest()
+
+def load_export_metadata(github_path: str, commodity: str) -> dict:
+    """Metadata of the previous export, empty if there is none"""
+    metadata_path = os.path.join(github_path, f'{commodity}_metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as f:
+            return json.load(f)
+    return {}
+
+def write_json_if_changed(path: str, data: dict) -> bool:
+    """
+    Write data with a fresh last_updated stamp unless the file already holds
+    the same content apart from that stamp. Returns whether it was written.
+    """
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            existing = json.load(f)
+        existing.pop('last_updated', None)
+        if existing == {k: v for k, v in data.items() if k != 'last_updated'}:
+            return False
+    
+    data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return True
+
+def chunk_is_current(github_path: str, previous: dict, digest: str) -> bool:
+    """Whether a previously exported chunk has the same content and all its files"""
+    if previous is None or previous.get('sha256') != digest:
+        return False
+    return all(os.path.exists(os.path.join(github_path, previous['file'] + suffix))
+               for suffix in (ENCODING_SUFFIXES[e] for e in EXPORT_ENCODINGS))
+
+def export_chunk(github_path: str, json_filename: str, df: pd.DataFrame,
+                 precision: int, previous: Optional[dict]) -> Tuple[dict, bool]:
+    """
+    Write one columnar file unless the previous export has the same content.
+    Returns its metadata entry and whether it was rewritten.
+    """
+    digest = content_hash(df, precision)
+    if chunk_is_current(github_path, previous, digest):
+        return {k: v for k, v in previous.items() if k != 'year'}, False
+    
+    payload = json.dumps(to_columnar(df, precision), separators=(',', ':')).encode()
+    sizes = write_compressed(os.path.join(github_path, json_filename), payload)
+    return {
+        'file': json_filename,
+        'start': df.index.min().strftime('%Y-%m-%d'),
+        'end': df.index.max().strftime('%Y-%m-%d'),
+        'rows': len(df),
+        'bytes': sizes,
+        'sha256': digest
+    }, True
+
+def export_roll_table(github_path: str, commodity: str, roll_table: pd.DataFrame,
+                      rule: str, previous: Optional[dict]) -> dict:
+    """Write the roll table as columnar JSON unless it is unchanged"""
+    payload = json.dumps({
+        'rule': rule,
+        'dates': roll_table['date'].dt.strftime('%Y-%m-%d').tolist(),
+        'from': roll_table['from_contract'].astype(str).tolist(),
+        'to': roll_table['to_contract'].astype(str).tolist()
+    }, separators=(',', ':')).encode()
+    digest = hashlib.sha256(payload).hexdigest()
+    if chunk_is_current(github_path, previous, digest):
+        return previous
+    
+    json_filename = f'{commodity}_rolls.json'
+    sizes = write_compressed(os.path.join(github_path, json_filename), payload)
+    return {'file': json_filename, 'rule': rule, 'rows': len(roll_table),
+            'bytes': sizes, 'sha256': digest}
+
+def export_spreads_to_json(commodity: str, configs: tuple, spread_files: Optional[dict] = None):
+    """
+    Export spread data to column-oriented JSON for GitHub, one file per
+    spread type and year, plus one file per downsampled pyramid level. The
+    metadata file lists the yearly chunks and levels with content hashes,
+    so clients load coarse levels for long views and daily chunks only for
+    the years they zoom into, and re-exports only rewrite changed files.
+    spread_files overrides the spread type -> file mapping, e.g. for the
+    inter-market spreads.
+    """
     fetch_config, spreads_config = configs
     print(f"\nExporting {commodity} data...")
     
@@ -17,17 +170,15 @@ def export_spreads_to_json(commodity: str, configs: tuple):
     github_path = os.path.join(fetch_config.BASE_PATH, 'data', commodity)
     os.makedirs(github_path, exist_ok=True)
     
-    # Map of spread types to files
-    spread_files = {
-        'dollar': 'spreads_dollar.parquet',
-        'percent': 'spreads_percent.parquet',
-        'annual': 'spreads_annual.parquet'
-    }
-    
-    exported_files = {}
+    previous_metadata = load_export_metadata(github_path, commodity)
+    previous_chunks = previous_metadata.get('chunks', {})
+    previous_levels = previous_metadata.get('levels', {})
+    chunks = {}
+    levels = {}
+    date_range = None
     
     try:
-        for spread_type, filename in spread_files.items():
+        for spread_type, filename in (spread_files or SPREAD_FILES).items():
             # Load parquet file
             parquet_path = os.path.join(processed_path, filename)
             if not os.path.exists(parquet_path):
@@ -35,42 +186,108 @@ def export_spreads_to_json(commodity: str, configs: tuple):
                 continue
                 
             df = pd.read_parquet(parquet_path)
+            date_range = {
+                'start': df.index.min().strftime('%Y-%m-%d'),
+                'end': df.index.max().strftime('%Y-%m-%d')
+            }
+            precision = EXPORT_PRECISION[spread_type]
+            previous = {c['year']: c for c in previous_chunks.get(spread_type, [])}
+            
+            # One chunk per year, written only if its content changed
+            chunks[spread_type] = []
+            written = 0
+            years = df.index.year
+            exported_years = set(np.unique(years).tolist())
+            for year in sorted(exported_years):
+                json_filename = f'{commodity}_{spread_type}_{year}.json'
+                entry, rewritten = export_chunk(github_path, json_filename, df[years == year],
+                                                precision, previous.get(year))
+                chunks[spread_type].append({'year': year, **entry})
+                written += rewritten
+            
+            # Downsampled levels, whole history in one file each
+            levels[spread_type] = {}
+            for level in PYRAMID_LEVELS:
+                level_df = load_pyramid_level(commodity, spread_type, level, spreads_config)
+                if level_df is None:
+                    print(f"Warning: {level} {spread_type} level not built for {commodity}")
+                    continue
+                json_filename = f'{commodity}_{spread_type}_{level}.json'
+                entry, rewritten = export_chunk(github_path, json_filename, level_df, precision,
+                                                previous_levels.get(spread_type, {}).get(level))
+                levels[spread_type][level] = entry
+                written += rewritten
             
-            # Convert to the format needed for visualization
-            df_export = df.reset_index()
-            df_export['date'] = df_export['index'].dt.strftime('%Y-%m-%d')
-            df_export = df_export.drop('index', axis=1)
+            # Chunks of years no longer in the data
+            for year, stale in previous.items():
+                if year not in exported_years:
+                    for suffix in ENCODING_SUFFIXES.values():
+                        stale_path = os.path.join(github_path, stale['file'] + suffix)
+                        if os.path.exists(stale_path):
+                            os.remove(stale_path)
             
-            # Save as JSON
-            json_filename = f'{commodity}_{spread_type}_spreads.json'
-            json_path = os.path.join(github_path, json_filename)
-            df_export.to_json(json_path, orient='records', date_format='iso')
+            print(f"Exported {spread_type}: {written} of "
+                  f"{len(chunks[spread_type]) + len(levels[spread_type])} files rewritten")
             
-            exported_files[spread_type] = json_filename
-            print(f"Exported {json_filename}")
+            # Records-oriented file of the previous format
+            legacy_path = os.path.join(github_path, f'{commodity}_{spread_type}_spreads.json')
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        
+        if not chunks:
+            print(f"No spread data to export for {commodity}")
+            return False
+        
+        # Roll dates of the configured rule
+        rolls = None
+        roll_table = load_roll_table(commodity, spreads_config)
+        if roll_table is not None:
+            rolls = export_roll_table(github_path, commodity, roll_table,
+                                      roll_rule_name(spreads_config),
+                                      previous_metadata.get('rolls'))
             
         # Create metadata file
         metadata = {
             'commodity': commodity,
-            'date_range': {
-                'start': df.index.min().strftime('%Y-%m-%d'),
-                'end': df.index.max().strftime('%Y-%m-%d')
-            },
-            'available_spreads': list(exported_files.keys()),
-            'files': exported_files,
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'format': EXPORT_FORMAT,
+            'date_range': date_range,
+            'available_spreads': list(chunks.keys()),
+            'precision': {t: EXPORT_PRECISION[t] for t in chunks},
+            'encodings': EXPORT_ENCODINGS,
+            'chunks': chunks,
+            'levels': levels,
+            'aggregations': AGGREGATIONS,
+            'rolls': rolls
         }
         
-        with open(os.path.join(github_path, f'{commodity}_metadata.json'), 'w') as f:
-            json.dump(metadata, f, indent=2)
-            
-        print(f"Successfully exported {commodity} data")
+        metadata_path = os.path.join(github_path, f'{commodity}_metadata.json')
+        if not write_json_if_changed(metadata_path, metadata):
+            print(f"{commodity} export is up to date")
+        else:
+            print(f"Successfully exported {commodity} data")
         return True
         
     except Exception as e:
         print(f"Error exporting {commodity}: {e}")
         return False
 
+def write_export_index(data_path: str, commodities: list, results: dict):
+    """Write the index.json listing exported commodities, if anything changed"""
+    inter_market_path = os.path.join(data_path, INTER_MARKET_NAME,
+                                     f'{INTER_MARKET_NAME}_metadata.json')
+    index = {
+        'commodities': commodities,
+        'spread_types': list(SPREAD_FILES),
+        'format': EXPORT_FORMAT,
+        'encodings': EXPORT_ENCODINGS,
+        'metadata': {commodity: f'{commodity}/{commodity}_metadata.json'
+                     for commodity in commodities},
+        'inter_market': (f'{INTER_MARKET_NAME}/{INTER_MARKET_NAME}_metadata.json'
+                         if os.path.exists(inter_market_path) else None),
+        'status': results
+    }
+    write_json_if_changed(os.path.join(data_path, 'index.json'), index)
+
 def main():
     """Export all commodities' data for GitHub"""
     # Setup configs
@@ -88,16 +305,12 @@ def main():
         success = export_spreads_to_json(commodity, configs)
         results[commodity] = success
     
-    # Create index file
-    index = {
-        'commodities': fetch_config.COMMODITIES,
-        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'spread_types': ['dollar', 'percent', 'annual'],
-        'status': results
-    }
+    # Spreads between commodities, from the stored spreads of their legs
+    if update_inter_market(fetch_config.RAW_DATA_PATH, spreads_config) is not None:
+        export_spreads_to_json(INTER_MARKET_NAME, configs, INTER_MARKET_FILES)
     
-    with open(os.path.join(data_path, 'index.json'), 'w') as f:
-        json.dump(index, f, indent=2)
+    # Create index file
+    write_export_index(data_path, fetch_config.COMMODITIES, results)
     
     print("\nExport Summary:")
     print("=" * 50)
@@ -4,6 +4,7 @@ import os
 from datetime import datetime
 from fetch_config import FetchConfig
 from data_fetcher import fetch_commodity_data
+from raw_store import raw_data_exists, get_raw_data_summary, get_active_contracts
 import pandas as pd
 
 def fetch_all_commodities():
@@ -36,15 +37,16 @@ def fetch_all_commodities():
             prices_df, volumes_df, metadata = fetch_commodity_data(commodity, config)
             
             if prices_df is not None and not prices_df.empty:
-                # Get latest data summary
-                last_date = prices_df.index.max()
-                active_contracts = prices_df.loc[last_date].dropna()
+                # Get latest data summary from the manifest
+                summary = get_raw_data_summary(commodity, config.RAW_DATA_PATH)
+                active_contracts = get_active_contracts(commodity, config.RAW_DATA_PATH)
+                last_date = pd.Timestamp(summary['end_date'])
                 
                 results[commodity] = {
                     'success': True,
                     'last_date': last_date,
                     'contracts_count': len(active_contracts),
-                    'date_range': f"{prices_df.index.min().date()} to {prices_df.index.max().date()}",
+                    'date_range': f"{summary['start_date'][:10]} to {summary['end_date'][:10]}",
                     'furthest_contract': sorted(active_contracts.index)[-1] if len(active_contracts) > 0 else None
                 }
                 
@@ -91,13 +93,9 @@ def analyze_coverage():
     
     for commodity in config.COMMODITIES:
         try:
-            commodity_path = os.path.join(config.RAW_DATA_PATH, commodity)
-            prices_path = os.path.join(commodity_path, 'prices.parquet')
-            
-            if os.path.exists(prices_path):
-                prices_df = pd.read_parquet(prices_path)
-                last_date = prices_df.index.max()
-                active_contracts = prices_df.loc[last_date].dropna()
+            if raw_data_exists(commodity, config.RAW_DATA_PATH):
+                active_contracts = get_active_contracts(commodity, config.RAW_DATA_PATH)
+                last_date = active_contracts.name
                 
                 print(f"\n{commodity} Contracts as of {last_date.date()}:")
                 print("-" * 40)
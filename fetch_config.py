@@ -10,6 +10,7 @@ class FetchConfig:
     
     # Batch processing
     BATCH_SIZE: int = 50
+    MAX_IN_FLIGHT_REQUESTS: int = 4  # Concurrent requests, keep within terminal limits
     DEFAULT_FIELDS: List[str] = None
     
     # Data parameters
@@ -20,6 +21,19 @@ class FetchConfig:
     
     # Update settings
     LOOKBACK_DAYS: int = 5
+    PRUNE_EXPIRED_TICKERS: bool = True  # Skip contracts that expired before the update window
+    EXPIRY_REPROBE_DAYS: int = 30  # Retry metadata of contracts without known expiry
+    
+    # Offline recording/replay of Bloomberg responses
+    RECORD_PATH: str = None  # Record live responses to this file
+    REPLAY_PATH: str = None  # Answer requests from this recording instead of the terminal
+    REPLAY_LATENCY: float = 0.0  # Seconds before each replayed response arrives
+    REPLAY_FRAGMENT_SIZE: int = 0  # Messages per replayed event, 0 for a single event
+    
+    # Pipeline concurrency (pipeline.py)
+    PIPELINE_FETCH_WORKERS: int = 3  # Commodities fetched at once over the shared session
+    PIPELINE_SPREAD_WORKERS: int = 4  # Processes calculating spreads
+    PIPELINE_PUBLISH_WORKERS: int = 2  # Processes exporting and plotting
     
     # Paths
     BASE_PATH: str = None
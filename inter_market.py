@@ -0,0 +1,172 @@
+# inter_market.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from typing import Dict, Optional, Tuple
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from spreads_calculator import apply_dtype_policy
+from spreads_pyramid import update_pyramid
+
+# Spreads between commodities, defined in SpreadsConfig.INTER_MARKET_SPREADS
+# and stored together as processed_data/INTERMARKET/inter_market.parquet
+INTER_MARKET_NAME = 'INTERMARKET'
+INTER_MARKET_FILES = {
+    'inter_market': 'inter_market.parquet'
+}
+
+# Dollar value of the currency part of QUOTE_UNITS ('USd' is cents)
+CURRENCY_FACTORS = {'USD': 1.0, 'USd': 0.01}
+
+# Size of each quoted measure in the base measure of its dimension
+MEASURE_SIZES = {
+    'bbl': ('volume', 42.0),
+    'gal': ('volume', 1.0),
+    'bu': ('volume', 9.30917696),
+    't oz': ('mass', 1.0),
+    'lb': ('mass', 14.5833333),
+    'mt': ('mass', 32150.7466),
+    'mmbtu': ('energy', 1.0)
+}
+
+def parse_units(units: str) -> Tuple[float, str, float]:
+    """Dollar factor, dimension and measure size of QUOTE_UNITS such as 'USD/bbl.'"""
+    currency, _, measure = units.strip().rstrip('.').partition('/')
+    measure = measure.strip().lower()
+    if currency not in CURRENCY_FACTORS or measure not in MEASURE_SIZES:
+        raise ValueError(f"Unsupported quote units {units!r}")
+    dimension, size = MEASURE_SIZES[measure]
+    return CURRENCY_FACTORS[currency], dimension, size
+
+def conversion_factor(from_units: str, to_units: str) -> float:
+    """Multiplier converting prices quoted in from_units to to_units"""
+    from_currency, from_dimension, from_size = parse_units(from_units)
+    to_currency, to_dimension, to_size = parse_units(to_units)
+    if from_dimension != to_dimension:
+        raise ValueError(f"Cannot convert {from_units} to {to_units}")
+    return from_currency / to_currency * to_size / from_size
+
+def get_quote_units(commodity: str, raw_data_path: str) -> Optional[str]:
+    """Most common QUOTE_UNITS among a commodity's contracts"""
+    metadata_path = os.path.join(raw_data_path, commodity, 'metadata.json')
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    units = pd.Series([info.get('units') or None for info in metadata.values()
+                       if isinstance(info, dict)], dtype=object).dropna()
+    return units.mode().iloc[0] if len(units) else None
+
+def load_curve(commodity: str, config: SpreadsConfig) -> Optional[pd.DataFrame]:
+    """
+    Month slot prices (month_<N>) and constant-maturity prices (cm_<T>d)
+    of a commodity, None if its spreads have not been calculated.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    futures_path = os.path.join(spread_path, 'monthly_futures.parquet')
+    if not os.path.exists(futures_path):
+        return None
+
+    monthly_futures = pd.read_parquet(futures_path)
+    prices = monthly_futures[[c for c in monthly_futures.columns if c.endswith('_price')]]
+    curve = prices.rename(columns=lambda c: c[:-len('_price')])
+
+    cm_path = os.path.join(spread_path, 'constant_maturity.parquet')
+    if os.path.exists(cm_path):
+        constant_maturity = pd.read_parquet(cm_path)
+        curve = curve.join(constant_maturity[[c for c in constant_maturity.columns
+                                              if not c.startswith('cm_spread')]])
+    return curve
+
+def build_inter_market(name: str, definition: Dict, curves: Dict[str, pd.DataFrame],
+                       units: Dict[str, str]) -> pd.DataFrame:
+    """
+    One spread definition over every tenor the legs share, on the dates all
+    legs are quoted. Leg prices are converted to the definition's units,
+    then combined as a weighted sum divided by 'divisor' or, for
+    kind 'ratio', as a product of the prices raised to their weights.
+    """
+    legs = definition['legs']
+    target_units = definition['units']
+
+    shared = set.intersection(*(set(curves[c].columns) for c in legs))
+    columns = [c for c in curves[next(iter(legs))].columns if c in shared]
+    index = curves[next(iter(legs))].index
+    for commodity in legs:
+        index = index.intersection(curves[commodity].index)
+
+    # (legs, dates, tenors) in the target units
+    stack = np.stack([
+        curves[commodity].reindex(index=index, columns=columns).to_numpy(dtype=np.float64)
+        * conversion_factor(units[commodity], target_units)
+        for commodity in legs
+    ])
+    weights = np.array(list(legs.values()), dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if definition.get('kind', 'spread') == 'ratio':
+            values = np.prod(stack ** weights[:, None, None], axis=0)
+        else:
+            values = np.tensordot(weights, stack, axes=1) / definition.get('divisor', 1.0)
+    return pd.DataFrame(values, index=index, columns=[f'{name}_{c}' for c in columns])
+
+def update_inter_market(raw_data_path: str, config: SpreadsConfig) -> Optional[pd.DataFrame]:
+    """
+    Calculate all configured inter-market spreads from the stored spreads
+    of their legs and save them with their downsampled levels. Definitions
+    with a leg that has no data or unconvertible units are skipped.
+    """
+    curves = {}
+    units = {}
+    frames = []
+    for name, definition in config.INTER_MARKET_SPREADS.items():
+        for commodity in definition['legs']:
+            if commodity not in curves:
+                curves[commodity] = load_curve(commodity, config)
+                units[commodity] = get_quote_units(commodity, raw_data_path)
+
+        missing = [c for c in definition['legs'] if curves[c] is None or units[c] is None]
+        if missing:
+            print(f"Skipping inter-market spread {name}: no data for {', '.join(missing)}")
+            continue
+        try:
+            frames.append(build_inter_market(name, definition, curves, units))
+        except ValueError as e:
+            print(f"Skipping inter-market spread {name}: {e}")
+
+    if not frames:
+        return None
+
+    inter_market = apply_dtype_policy(pd.concat(frames, axis=1).sort_index(), config)
+    output_path = os.path.join(config.PROCESSED_DATA_PATH, INTER_MARKET_NAME)
+    os.makedirs(output_path, exist_ok=True)
+    inter_market.to_parquet(os.path.join(output_path, INTER_MARKET_FILES['inter_market']))
+
+    with open(os.path.join(output_path, 'inter_market_info.json'), 'w') as f:
+        json.dump({
+            'date_range': {
+                'start': inter_market.index.min().isoformat(),
+                'end': inter_market.index.max().isoformat()
+            },
+            'definitions': config.INTER_MARKET_SPREADS,
+            'quote_units': {c: u for c, u in units.items() if u is not None}
+        }, f, indent=2)
+
+    update_pyramid(INTER_MARKET_NAME, config, INTER_MARKET_FILES)
+    print(f"Updated inter-market spreads: {len(frames)} definitions, "
+          f"{len(inter_market.columns)} columns")
+    return inter_market
+
+def main():
+    """Calculate the inter-market spreads of the stored commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    if update_inter_market(fetch_config.RAW_DATA_PATH, config) is None:
+        print("No inter-market spreads could be calculated")
+
+if __name__ == "__main__":
+    main()
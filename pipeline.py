@@ -0,0 +1,155 @@
+# pipeline.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from data_fetcher import start_bloomberg_session, fetch_commodity_data, SharedSessionView
+from calculate_all_spreads import calculate_spreads_for_commodity
+from export_for_github import export_spreads_to_json, write_export_index
+from inter_market import INTER_MARKET_NAME, INTER_MARKET_FILES, update_inter_market
+from spreads_visualizer import render_commodity
+
+# Stages run per commodity, each one starting as soon as the previous lands:
+#   fetch   - threads sharing one Bloomberg session
+#   spreads - process pool
+#   publish - process pool, JSON export and PDF visualizations
+STAGES = ['fetch', 'spreads', 'publish']
+
+def fetch_stage(commodity: str, config: FetchConfig, session) -> Dict:
+    """Fetch one commodity over the shared session"""
+    start = time.perf_counter()
+    try:
+        fetch_commodity_data(commodity, config, session=SharedSessionView(session))
+        return {'success': True, 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        print(f"Error fetching {commodity}: {e}")
+        return {'success': False, 'error': str(e), 'seconds': time.perf_counter() - start}
+
+def spreads_stage(commodity: str, fetch_config: FetchConfig, spreads_config: SpreadsConfig) -> Dict:
+    """Calculate spreads for one commodity in a worker process"""
+    start = time.perf_counter()
+    result = calculate_spreads_for_commodity(commodity, fetch_config, spreads_config)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def publish_stage(commodity: str, fetch_config: FetchConfig, spreads_config: SpreadsConfig) -> Dict:
+    """Export and plot the spreads of one commodity in a worker process"""
+    start = time.perf_counter()
+    try:
+        if not export_spreads_to_json(commodity, (fetch_config, spreads_config)):
+            return {'success': False, 'error': 'Export failed',
+                    'seconds': time.perf_counter() - start}
+
+        result = render_commodity(commodity, spreads_config)
+        if result['status'] not in ['rendered', 'skipped']:
+            return {'success': False, 'error': result.get('error', result['status']),
+                    'seconds': time.perf_counter() - start}
+        return {'success': True, 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        print(f"Error publishing {commodity}: {e}")
+        return {'success': False, 'error': str(e), 'seconds': time.perf_counter() - start}
+
+def run_pipeline(fetch_config: FetchConfig, spreads_config: SpreadsConfig,
+                 commodities: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Fetch, calculate and publish all commodities concurrently.
+    Every fetch worker keeps up to MAX_IN_FLIGHT_REQUESTS requests in flight
+    on the shared session, so size PIPELINE_FETCH_WORKERS with that in mind.
+    Returns stage results per commodity.
+    """
+    commodities = commodities or fetch_config.COMMODITIES
+    results = {commodity: {} for commodity in commodities}
+
+    session = start_bloomberg_session(fetch_config)
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_config.PIPELINE_FETCH_WORKERS) as fetch_pool, \
+             ProcessPoolExecutor(max_workers=fetch_config.PIPELINE_SPREAD_WORKERS) as spread_pool, \
+             ProcessPoolExecutor(max_workers=fetch_config.PIPELINE_PUBLISH_WORKERS) as publish_pool:
+
+            pending = {}
+            for commodity in commodities:
+                future = fetch_pool.submit(fetch_stage, commodity, fetch_config, session)
+                pending[future] = ('fetch', commodity)
+
+            # Hand each commodity to the next stage as soon as a stage lands
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, commodity = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e), 'seconds': 0.0}
+                    results[commodity][stage] = result
+                    print(f"{commodity}: {stage} {'done' if result['success'] else 'failed'} "
+                          f"in {result['seconds']:.1f}s")
+
+                    if not result['success']:
+                        continue
+                    if stage == 'fetch':
+                        future = spread_pool.submit(spreads_stage, commodity,
+                                                    fetch_config, spreads_config)
+                        pending[future] = ('spreads', commodity)
+                    elif stage == 'spreads':
+                        future = publish_pool.submit(publish_stage, commodity,
+                                                     fetch_config, spreads_config)
+                        pending[future] = ('publish', commodity)
+    finally:
+        session.stop()
+
+    # Spreads between commodities need every leg, so they run last
+    if update_inter_market(fetch_config.RAW_DATA_PATH, spreads_config) is not None:
+        export_spreads_to_json(INTER_MARKET_NAME, (fetch_config, spreads_config), INTER_MARKET_FILES)
+
+    # Index of the exported commodities
+    data_path = os.path.join(fetch_config.BASE_PATH, 'data')
+    os.makedirs(data_path, exist_ok=True)
+    write_export_index(data_path, commodities, {
+        commodity: stages.get('publish', {}).get('success', False)
+        for commodity, stages in results.items()
+    })
+    return results
+
+def print_pipeline_summary(results: Dict[str, Dict], wall_seconds: float):
+    """Per-stage status and time of every commodity"""
+    print("\nPipeline Summary")
+    print("=" * 80)
+    print(f"{'Commodity':<10} {'Fetch':<14} {'Spreads':<14} {'Publish':<14} {'Error'}")
+    print("-" * 80)
+
+    stage_seconds = 0.0
+    for commodity, stages in results.items():
+        cells, error = [], ''
+        for stage in STAGES:
+            result = stages.get(stage)
+            if result is None:
+                cells.append(f"{'-':<14}")
+                continue
+            stage_seconds += result['seconds']
+            status = '✓' if result['success'] else '✗'
+            cells.append(f"{status} {result['seconds']:>8.1f}s   ")
+            if not result['success']:
+                error = result.get('error', '')
+        print(f"{commodity:<10} {' '.join(cells)} {error}")
+
+    successful = sum(stages.get('publish', {}).get('success', False) for stages in results.values())
+    print(f"\nCompleted: {successful}/{len(results)} commodities")
+    print(f"Wall time: {wall_seconds:.1f}s (sum of stage times: {stage_seconds:.1f}s)")
+
+def main():
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    spreads_config = SpreadsConfig(BASE_PATH=base_path)
+
+    start_time = datetime.now()
+    print(f"Starting pipeline at {start_time.strftime('%H:%M:%S')}")
+    start = time.perf_counter()
+    results = run_pipeline(fetch_config, spreads_config)
+    print_pipeline_summary(results, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
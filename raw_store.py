@@ -0,0 +1,284 @@
+# raw_store.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+import pyarrow.parquet as pq
+from datetime import datetime
+from typing import Dict, List, Optional
+from fetch_config import FetchConfig
+
+# Raw data is stored per commodity as one parquet file per kind and year:
+#   raw_data/<COMMODITY>/prices/<YEAR>.parquet
+#   raw_data/<COMMODITY>/volumes/<YEAR>.parquet
+#   raw_data/<COMMODITY>/manifest.json
+DATA_KINDS = ['prices', 'volumes']
+MANIFEST_FILE = 'manifest.json'
+
+def get_commodity_path(commodity: str, raw_data_path: str) -> str:
+    return os.path.join(raw_data_path, commodity)
+
+def load_manifest(commodity: str, raw_data_path: str) -> Dict:
+    """Load the partition manifest, empty if the commodity has none yet"""
+    manifest_path = os.path.join(get_commodity_path(commodity, raw_data_path), MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    return {'contracts': {kind: [] for kind in DATA_KINDS},
+            'partitions': {kind: {} for kind in DATA_KINDS}}
+
+def save_manifest(commodity: str, raw_data_path: str, manifest: Dict):
+    manifest['last_update'] = datetime.now().isoformat()
+    manifest_path = os.path.join(get_commodity_path(commodity, raw_data_path), MANIFEST_FILE)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def has_legacy_files(commodity: str, raw_data_path: str) -> bool:
+    """Whether the commodity still uses single prices/volumes parquet files"""
+    commodity_path = get_commodity_path(commodity, raw_data_path)
+    return os.path.exists(os.path.join(commodity_path, 'prices.parquet'))
+
+def raw_data_exists(commodity: str, raw_data_path: str) -> bool:
+    """Whether any raw price data is stored for the commodity"""
+    manifest = load_manifest(commodity, raw_data_path)
+    return bool(manifest['partitions']['prices']) or has_legacy_files(commodity, raw_data_path)
+
+def partition_stats(df: pd.DataFrame) -> Dict:
+    """Row count, date range and value count of one partition"""
+    return {
+        'rows': len(df),
+        'start': df.index.min().isoformat(),
+        'end': df.index.max().isoformat(),
+        'contracts': len(df.columns),
+        'values': int(df.notna().sum().sum())
+    }
+
+def write_partitions(commodity: str, raw_data_path: str, kind: str,
+                     df: pd.DataFrame, manifest: Dict) -> List[int]:
+    """
+    Rewrite the year partitions covered by df and update their manifest
+    entries. Contracts without values in a year are not stored for it.
+    """
+    kind_path = os.path.join(get_commodity_path(commodity, raw_data_path), kind)
+    os.makedirs(kind_path, exist_ok=True)
+
+    years = df.index.year
+    written = []
+    for year in np.unique(years):
+        partition = df[years == year]
+        partition = partition.loc[:, partition.notna().any()]
+        partition.to_parquet(os.path.join(kind_path, f'{year}.parquet'))
+        manifest['partitions'][kind][str(year)] = partition_stats(partition)
+        written.append(int(year))
+
+    contracts = set(manifest['contracts'].get(kind, [])) | set(df.columns)
+    manifest['contracts'][kind] = sorted(contracts)
+    if kind == 'prices':
+        update_latest_prices(df, manifest)
+    return written
+
+def update_latest_prices(prices_df: pd.DataFrame, manifest: Dict):
+    """Keep the prices of the most recent date in the manifest"""
+    if prices_df.empty:
+        return
+    last_date = prices_df.index.max()
+    latest = manifest.get('latest')
+    if latest is None or pd.Timestamp(latest['date']) <= last_date:
+        row = prices_df.iloc[int(np.argmax(prices_df.index))].dropna()
+        manifest['latest'] = {
+            'date': last_date.isoformat(),
+            'prices': {contract: float(price) for contract, price in row.items()}
+        }
+
+def migrate_legacy_files(commodity: str, raw_data_path: str):
+    """Split single prices/volumes parquet files into year partitions"""
+    commodity_path = get_commodity_path(commodity, raw_data_path)
+    print(f"Migrating {commodity} raw data to year partitions...")
+
+    manifest = load_manifest(commodity, raw_data_path)
+    for kind in DATA_KINDS:
+        legacy_path = os.path.join(commodity_path, f'{kind}.parquet')
+        if os.path.exists(legacy_path):
+            write_partitions(commodity, raw_data_path, kind,
+                             pd.read_parquet(legacy_path), manifest)
+    save_manifest(commodity, raw_data_path, manifest)
+
+    for kind in DATA_KINDS:
+        legacy_path = os.path.join(commodity_path, f'{kind}.parquet')
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+def save_raw_data(commodity: str, raw_data_path: str, prices_df: pd.DataFrame,
+                  volumes_df: pd.DataFrame) -> Dict:
+    """
+    Store prices and volumes, rewriting only the years they cover.
+    Returns the updated manifest.
+    """
+    os.makedirs(get_commodity_path(commodity, raw_data_path), exist_ok=True)
+    if has_legacy_files(commodity, raw_data_path):
+        migrate_legacy_files(commodity, raw_data_path)
+
+    manifest = load_manifest(commodity, raw_data_path)
+    years = write_partitions(commodity, raw_data_path, 'prices', prices_df, manifest)
+    write_partitions(commodity, raw_data_path, 'volumes', volumes_df, manifest)
+    save_manifest(commodity, raw_data_path, manifest)
+
+    print(f"Wrote {len(years)} year partitions for {commodity}: {', '.join(map(str, years))}")
+    return manifest
+
+def load_raw_data(commodity: str, raw_data_path: str, kind: str = 'prices',
+                  start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None,
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load prices or volumes for a commodity, reading only the year
+    partitions that overlap [start_date, end_date].
+    """
+    commodity_path = get_commodity_path(commodity, raw_data_path)
+
+    if has_legacy_files(commodity, raw_data_path):
+        df = pd.read_parquet(os.path.join(commodity_path, f'{kind}.parquet'))
+    else:
+        manifest = load_manifest(commodity, raw_data_path)
+        years = sorted(int(year) for year in manifest['partitions'][kind])
+        if start_date is not None:
+            years = [year for year in years if year >= start_date.year]
+        if end_date is not None:
+            years = [year for year in years if year <= end_date.year]
+        if not years:
+            return pd.DataFrame()
+
+        partitions = [pd.read_parquet(os.path.join(commodity_path, kind, f'{year}.parquet'))
+                      for year in years]
+        df = pd.concat(partitions).reindex(columns=manifest['contracts'][kind])
+
+    if start_date is not None:
+        df = df[df.index >= start_date]
+    if end_date is not None:
+        df = df[df.index <= end_date]
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    return df
+
+def get_legacy_summary(commodity: str, raw_data_path: str) -> Dict:
+    """Summary of a single prices.parquet file from its footer statistics"""
+    prices_path = os.path.join(get_commodity_path(commodity, raw_data_path), 'prices.parquet')
+    parquet_file = pq.ParquetFile(prices_path)
+    metadata = parquet_file.metadata
+    index_column = parquet_file.schema_arrow.pandas_metadata['index_columns'][0]
+
+    starts, ends, nulls = [], [], 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            if column.path_in_schema == index_column:
+                starts.append(pd.Timestamp(column.statistics.min))
+                ends.append(pd.Timestamp(column.statistics.max))
+            elif column.statistics is not None:
+                nulls += column.statistics.null_count
+
+    trading_days = metadata.num_rows
+    contracts = metadata.num_columns - 1
+    cells = trading_days * contracts
+    return {
+        'start_date': min(starts).isoformat(),
+        'end_date': max(ends).isoformat(),
+        'trading_days': trading_days,
+        'contracts_count': contracts,
+        'completeness': 1 - nulls / cells if cells else 0.0,
+        'last_date': max(ends).isoformat(),
+        'active_contracts': None
+    }
+
+def get_raw_data_summary(commodity: str, raw_data_path: str) -> Dict:
+    """
+    Date range, trading days, completeness and the prices of the contracts
+    active on the last date, without reading any data files.
+    """
+    if has_legacy_files(commodity, raw_data_path):
+        return get_legacy_summary(commodity, raw_data_path)
+
+    manifest = load_manifest(commodity, raw_data_path)
+    partitions = manifest['partitions']['prices'].values()
+    if not partitions:
+        return {}
+
+    trading_days = sum(p['rows'] for p in partitions)
+    contracts = len(manifest['contracts']['prices'])
+    values = sum(p['values'] for p in partitions)
+    latest = manifest.get('latest', {})
+    return {
+        'start_date': min(p['start'] for p in partitions),
+        'end_date': max(p['end'] for p in partitions),
+        'trading_days': trading_days,
+        'contracts_count': contracts,
+        'completeness': values / (trading_days * contracts) if trading_days and contracts else 0.0,
+        'last_date': latest.get('date'),
+        'active_contracts': latest.get('prices')
+    }
+
+def get_active_contracts(commodity: str, raw_data_path: str) -> pd.Series:
+    """Prices of the contracts quoted on the last stored date"""
+    summary = get_raw_data_summary(commodity, raw_data_path)
+    if not summary:
+        return pd.Series(dtype=float)
+    if summary['active_contracts'] is not None:
+        return pd.Series(summary['active_contracts'], name=pd.Timestamp(summary['last_date']))
+
+    # Older manifests and legacy files: read only the last year
+    last_date = pd.Timestamp(summary['end_date'])
+    prices_df = load_raw_data(commodity, raw_data_path, start_date=datetime(last_date.year, 1, 1))
+    return prices_df.loc[last_date].dropna()
+
+def load_catalog(commodities: List[str], raw_data_path: str) -> Dict[str, Dict]:
+    """Raw data summary of every commodity that has data stored"""
+    return {commodity: get_raw_data_summary(commodity, raw_data_path)
+            for commodity in commodities if raw_data_exists(commodity, raw_data_path)}
+
+def compact_raw_data(commodity: str, raw_data_path: str):
+    """
+    Rewrite all partitions of a commodity: migrate legacy files, sort rows
+    and contracts, drop duplicate dates and contracts without data, and
+    rebuild the manifest from the files on disk.
+    """
+    if has_legacy_files(commodity, raw_data_path):
+        migrate_legacy_files(commodity, raw_data_path)
+
+    commodity_path = get_commodity_path(commodity, raw_data_path)
+    manifest = {'contracts': {kind: [] for kind in DATA_KINDS},
+                'partitions': {kind: {} for kind in DATA_KINDS}}
+
+    for kind in DATA_KINDS:
+        kind_path = os.path.join(commodity_path, kind)
+        if not os.path.isdir(kind_path):
+            continue
+
+        files = sorted(f for f in os.listdir(kind_path) if f.endswith('.parquet'))
+        for filename in files:
+            df = pd.read_parquet(os.path.join(kind_path, filename))
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+            df = df.reindex(sorted(df.columns[df.notna().any()]), axis=1)
+            if df.empty:
+                os.remove(os.path.join(kind_path, filename))
+            else:
+                write_partitions(commodity, raw_data_path, kind, df, manifest)
+
+    save_manifest(commodity, raw_data_path, manifest)
+    summary = get_raw_data_summary(commodity, raw_data_path)
+    print(f"Compacted {commodity}: {len(manifest['partitions']['prices'])} partitions, "
+          f"{summary.get('contracts_count', 0)} contracts")
+
+def main():
+    """Compact raw data of all commodities"""
+    config = FetchConfig(BASE_PATH=os.getcwd())
+
+    for commodity in config.COMMODITIES:
+        if raw_data_exists(commodity, config.RAW_DATA_PATH):
+            compact_raw_data(commodity, config.RAW_DATA_PATH)
+        else:
+            print(f"No raw data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
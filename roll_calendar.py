@@ -0,0 +1,166 @@
+# roll_calendar.py
+
+import pandas as pd
+import numpy as np
+import os
+from datetime import datetime
+from typing import Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from contract_index import ContractIndex, load_contract_index
+from raw_store import load_raw_data
+
+# Roll rules, selected with SpreadsConfig.ROLL_RULE:
+#   expiry        - hold the front contract through its last trade date
+#   business_days - roll ROLL_BUSINESS_DAYS business days before the last trade date
+#   volume        - roll once the next contract trades more than the front
+# Each rule's roll table is stored as processed_data/<COMMODITY>/rolls_<rule>.parquet
+ROLL_RULES = ['expiry', 'business_days', 'volume']
+
+def roll_rule_name(config: SpreadsConfig) -> str:
+    """Rule name used in the roll table file name"""
+    if config.ROLL_RULE not in ROLL_RULES:
+        raise ValueError(f"Unknown roll rule {config.ROLL_RULE}, expected one of {ROLL_RULES}")
+    if config.ROLL_RULE == 'business_days':
+        return f'bd{config.ROLL_BUSINESS_DAYS}'
+    return config.ROLL_RULE
+
+def get_roll_table_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity,
+                        f'rolls_{roll_rule_name(config)}.parquet')
+
+def shift_expiries(contract_index: ContractIndex, business_days: int) -> ContractIndex:
+    """Index whose contracts expire business_days before their last trade date"""
+    expiry = contract_index.expiry_days.astype('datetime64[D]')
+    shifted = np.busday_offset(expiry, -business_days, roll='backward')
+    return ContractIndex(contract_index.contracts, shifted.astype(np.int64))
+
+def volume_leaders(dates: pd.DatetimeIndex, contract_index: ContractIndex,
+                   volumes_df: pd.DataFrame) -> np.ndarray:
+    """
+    Position of the first unexpired contract on each date, or of the one
+    after it where that one traded more volume.
+    """
+    first = contract_index.first_unexpired(dates)
+    volumes = volumes_df.reindex(dates).to_numpy(dtype=np.float64)
+
+    # Volume column of every index position, -1 for contracts without volumes
+    columns = np.full(len(contract_index) + 2, -1, dtype=np.int64)
+    positions = contract_index.positions(volumes_df.columns)
+    found = positions >= 0
+    columns[positions[found]] = np.flatnonzero(found)
+
+    rows = np.arange(len(dates))
+    padded = np.column_stack([volumes, np.full(len(dates), np.nan)])
+    front_volume = padded[rows, columns[first]]
+    next_volume = padded[rows, columns[first + 1]]
+    return np.where(next_volume > front_volume, first + 1, first)
+
+def held_positions(dates: pd.DatetimeIndex, contract_index: ContractIndex,
+                   rule: str = 'expiry', business_days: int = 0,
+                   volumes_df: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """Index position of the contract held on each date under a roll rule"""
+    if rule == 'expiry':
+        return contract_index.first_unexpired(dates)
+    if rule == 'business_days':
+        return shift_expiries(contract_index, business_days).first_unexpired(dates)
+    if rule == 'volume':
+        if volumes_df is None:
+            raise ValueError("Volume roll rule requires volumes")
+        return volume_leaders(dates, contract_index, volumes_df)
+    raise ValueError(f"Unknown roll rule {rule}, expected one of {ROLL_RULES}")
+
+def build_roll_table(dates, contract_index: ContractIndex, rule: str = 'expiry',
+                     business_days: int = 0, volumes_df: Optional[pd.DataFrame] = None,
+                     held_before: int = -1) -> pd.DataFrame:
+    """
+    Roll table (date, from_contract, to_contract) over the given dates.
+    held_before is the index position held before the first date, -1 if
+    none, in which case the first date is not a roll; contracts are never
+    rolled back to an earlier position. Under the expiry rule the dates
+    are those of ContractIndex.roll_dates.
+    """
+    dates = pd.DatetimeIndex(dates)
+    held = held_positions(dates, contract_index, rule, business_days, volumes_df)
+    held = np.maximum.accumulate(np.maximum(held, held_before)) if len(held) else held
+
+    previous = np.concatenate([[held_before], held[:-1]])
+    rolled = (held != previous) & (previous >= 0) & (held < len(contract_index))
+
+    contract_dtype = pd.CategoricalDtype(contract_index.contracts)
+    return pd.DataFrame({
+        'date': dates[rolled],
+        'from_contract': pd.Categorical.from_codes(previous[rolled], dtype=contract_dtype),
+        'to_contract': pd.Categorical.from_codes(held[rolled], dtype=contract_dtype)
+    })
+
+def load_roll_table(commodity: str, config: SpreadsConfig) -> Optional[pd.DataFrame]:
+    """Stored roll table of the configured rule, None if not built"""
+    path = get_roll_table_path(commodity, config)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def update_roll_table(commodity: str, raw_data_path: str, config: SpreadsConfig,
+                      start_date: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+    """
+    Build the roll table of the configured rule over the dates of the
+    processed spreads. With start_date, rolls before it are kept and only
+    later dates are recomputed, continuing from the contract held before
+    start_date. Without an earlier roll that contract is the one held on
+    the last earlier date; the volume rule, which needs volumes for it,
+    rebuilds the whole table instead.
+    """
+    contract_index = load_contract_index(commodity, raw_data_path)
+    futures_path = os.path.join(config.PROCESSED_DATA_PATH, commodity, 'monthly_futures.parquet')
+    if contract_index is None or not os.path.exists(futures_path):
+        return None
+
+    path = get_roll_table_path(commodity, config)
+    dates = pd.read_parquet(futures_path, columns=[]).index
+
+    kept = None
+    held_before = -1
+    if start_date is not None and os.path.exists(path):
+        existing = pd.read_parquet(path)
+        kept = existing[existing['date'] < start_date]
+        earlier = dates[dates < start_date]
+        if len(kept):
+            held_before = contract_index.positions([kept['to_contract'].iloc[-1]])[0]
+        elif len(earlier) and config.ROLL_RULE != 'volume':
+            # No roll yet, so nothing was rolled past the contract held on the
+            # last earlier date; the other rules never move back to an earlier one
+            held_before = held_positions(earlier[-1:], contract_index, config.ROLL_RULE,
+                                         config.ROLL_BUSINESS_DAYS)[0]
+        elif len(earlier):
+            kept = start_date = None
+        if start_date is not None:
+            dates = dates[dates >= start_date]
+    else:
+        start_date = None
+
+    volumes_df = None
+    if config.ROLL_RULE == 'volume':
+        volumes_df = load_raw_data(commodity, raw_data_path, kind='volumes', start_date=start_date)
+
+    table = build_roll_table(dates, contract_index, config.ROLL_RULE,
+                             config.ROLL_BUSINESS_DAYS, volumes_df, held_before)
+    if kept is not None and len(kept):
+        table = pd.concat([kept, table], ignore_index=True)
+
+    table.to_parquet(path)
+    print(f"Roll table for {commodity} ({roll_rule_name(config)}): {len(table)} rolls")
+    return table
+
+def main():
+    """Build roll tables of all commodities for every rule"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        for rule in ROLL_RULES:
+            config = SpreadsConfig(BASE_PATH=base_path, ROLL_RULE=rule)
+            update_roll_table(commodity, fetch_config.RAW_DATA_PATH, config)
+
+if __name__ == "__main__":
+    main()
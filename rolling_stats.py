@@ -0,0 +1,239 @@
+# rolling_stats.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from typing import Dict, List, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from spreads_calculator import apply_dtype_policy
+from spreads_pyramid import get_source_key
+
+# Rolling mean, standard deviation and z-score of every spread column over
+# SpreadsConfig.ROLLING_WINDOWS, stored as
+#   processed_data/<COMMODITY>/rolling_<TYPE>.parquet
+# with columns <spread>_mean_<W>, <spread>_std_<W> and <spread>_z_<W>.
+# The moment state of each window is kept next to spread_info.json in
+# rolling_state.json and rolling_buffer_<TYPE>.parquet so new dates are
+# streamed in without rescanning the history.
+ROLLING_SPREAD_FILES = {
+    'percent': 'spreads_percent.parquet',
+    'annual': 'spreads_annual.parquet'
+}
+ROLLING_STATS = ['mean', 'std', 'z']
+
+def min_periods(window: int) -> int:
+    """Values needed in a window for its statistics, at least two for a deviation"""
+    return max(2, (window + 1) // 2)
+
+def stat_columns(columns: List[str], windows: List[int]) -> List[str]:
+    """Output columns by window, then statistic, then spread"""
+    return [f'{column}_{stat}_{window}'
+            for window in windows for stat in ROLLING_STATS for column in columns]
+
+class RollingState:
+    """
+    Welford count, mean and sum of squared deviations of each column over
+    every window, plus a ring buffer of the last max(windows) rows so the
+    value leaving each window is known. Pushing a row is O(windows x columns)
+    whatever the history length.
+    """
+
+    def __init__(self, windows: List[int], buffer: np.ndarray, count: np.ndarray,
+                 mean: np.ndarray, m2: np.ndarray):
+        self.windows = np.array(windows)
+        self.min_periods = np.array([min_periods(w) for w in windows])[:, None]
+        self.buffer = buffer.astype(np.float64)
+        self.position = 0  # Oldest row of the buffer
+        self.count = count.astype(np.int64)
+        self.mean = mean.astype(np.float64)
+        self.m2 = m2.astype(np.float64)
+
+    @classmethod
+    def from_history(cls, windows: List[int], values: np.ndarray) -> 'RollingState':
+        """State after the rows of values (dates x columns), computed in one pass per window"""
+        size = max(windows)
+        buffer = np.full((size, values.shape[1]), np.nan)
+        recent = values[-size:]
+        if len(recent):
+            buffer[-len(recent):] = recent
+
+        count, mean, m2 = [], [], []
+        for window in windows:
+            last = buffer[-window:]
+            observed = ~np.isnan(last)
+            n = observed.sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                window_mean = np.where(n > 0, np.nansum(last, axis=0) / n, 0.0)
+            count.append(n)
+            mean.append(window_mean)
+            m2.append(np.nansum((last - window_mean) ** 2, axis=0))
+        return cls(windows, buffer, np.array(count), np.array(mean), np.array(m2))
+
+    def copy(self) -> 'RollingState':
+        return RollingState(self.windows.tolist(), self.ordered_buffer(),
+                            self.count, self.mean, self.m2)
+
+    def ordered_buffer(self) -> np.ndarray:
+        """Buffered rows oldest first"""
+        return np.roll(self.buffer, -self.position, axis=0)
+
+    def push(self, row: np.ndarray) -> np.ndarray:
+        """Add one row of values, returning (statistics, windows, columns)"""
+        size = len(self.buffer)
+        leaving = self.buffer[(self.position - self.windows) % size]
+        entering = np.broadcast_to(row, leaving.shape)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Take out the value leaving each window, then add the new one
+            removed = ~np.isnan(leaving)
+            count = self.count - removed
+            delta = leaving - self.mean
+            mean = np.where(removed, np.where(count > 0, self.mean - delta / count, 0.0), self.mean)
+            m2 = np.where(removed, np.where(count > 0, self.m2 - delta * (leaving - mean), 0.0), self.m2)
+
+            added = ~np.isnan(entering)
+            count = count + added
+            delta = entering - mean
+            new_mean = np.where(added, mean + delta / count, mean)
+            m2 = np.where(added, m2 + delta * (entering - new_mean), m2)
+
+            self.count, self.mean, self.m2 = count, new_mean, m2
+            self.buffer[self.position] = row
+            self.position = (self.position + 1) % size
+
+            ready = count >= self.min_periods
+            std = np.where(ready, np.sqrt(np.maximum(m2, 0.0) / (count - 1)), np.nan)
+            z = (entering - new_mean) / np.where(std > 0, std, np.nan)
+        return np.stack([np.where(ready, new_mean, np.nan), std, z])
+
+    def advance(self, values: np.ndarray) -> np.ndarray:
+        """Push rows in order, returning their statistics flattened as stat_columns"""
+        n_columns = self.buffer.shape[1]
+        stats = np.empty((len(values), len(ROLLING_STATS) * len(self.windows) * n_columns))
+        for i, row in enumerate(values):
+            stats[i] = self.push(row).transpose(1, 0, 2).ravel()
+        return stats
+
+def rolling_frame(df: pd.DataFrame, windows: List[int]) -> pd.DataFrame:
+    """Statistics of every date at once with pandas' rolling windows, for full rebuilds"""
+    frames = []
+    for window in windows:
+        rolling = df.rolling(window, min_periods=min_periods(window))
+        mean = rolling.mean()
+        std = rolling.std()
+        z = (df - mean) / std.where(std > 0)
+        frames.extend([mean, std, z])
+    stats = pd.concat(frames, axis=1)
+    stats.columns = stat_columns(list(df.columns), windows)
+    return stats
+
+def update_rolling_stats(commodity: str, config: SpreadsConfig) -> Dict[str, pd.DataFrame]:
+    """
+    Build or extend the rolling statistics of a commodity's percent and
+    annualized spreads. The state is checkpointed before the last
+    INCREMENTAL_OVERLAP_DAYS, which the next calculation may rewrite, and
+    rows after the checkpoint are streamed through it. Changed windows,
+    columns or source data rebuild from scratch. Returns the statistics
+    per spread type.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    state_path = os.path.join(spread_path, 'rolling_state.json')
+    windows = list(config.ROLLING_WINDOWS)
+
+    info = {}
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            info = json.load(f)
+    source = get_source_key(commodity, config)
+    incremental = source is not None and info.get('source') == source and info.get('windows') == windows
+
+    results = {}
+    types = {}
+    for spread_type, filename in ROLLING_SPREAD_FILES.items():
+        source_path = os.path.join(spread_path, filename)
+        if not os.path.exists(source_path):
+            continue
+        df = pd.read_parquet(source_path).astype(np.float64)
+        output_path = os.path.join(spread_path, f'rolling_{spread_type}.parquet')
+        buffer_path = os.path.join(spread_path, f'rolling_buffer_{spread_type}.parquet')
+        stable_until = df.index.max() - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
+
+        previous = info.get('types', {}).get(spread_type, {})
+        checkpoint = pd.Timestamp(previous['checkpoint']) if previous.get('checkpoint') else None
+        type_incremental = (incremental and previous.get('columns') == list(df.columns)
+                            and os.path.exists(output_path) and os.path.exists(buffer_path)
+                            and (checkpoint is None or df.index.max() >= checkpoint))
+
+        if type_incremental:
+            state = RollingState(windows, pd.read_parquet(buffer_path).to_numpy(dtype=np.float64),
+                                 np.array(previous['count']), np.array(previous['mean']),
+                                 np.array(previous['m2']))
+            kept = pd.read_parquet(output_path)
+            new_rows = df
+            if checkpoint is not None:
+                kept = kept[kept.index <= checkpoint]
+                new_rows = df[df.index > checkpoint]
+            else:
+                kept = kept.iloc[:0]
+
+            # Rows up to the new checkpoint, then the ones that may be recalculated
+            stable = new_rows.index < stable_until
+            stats = [state.advance(new_rows.to_numpy()[stable])]
+            snapshot = state.copy()
+            stats.append(state.advance(new_rows.to_numpy()[~stable]))
+            if stable.any():
+                checkpoint = new_rows.index[stable][-1]
+
+            recomputed = pd.DataFrame(np.vstack(stats), index=new_rows.index,
+                                      columns=stat_columns(list(df.columns), windows))
+            frame = pd.concat([kept.astype(np.float64), recomputed])
+        else:
+            frame = rolling_frame(df, windows)
+            history = df[df.index < stable_until]
+            checkpoint = history.index.max() if len(history) else None
+            snapshot = RollingState.from_history(windows, history.to_numpy())
+
+        frame = apply_dtype_policy(frame, config)
+        frame.to_parquet(output_path)
+        pd.DataFrame(snapshot.ordered_buffer(), columns=df.columns).to_parquet(buffer_path)
+        types[spread_type] = {
+            'columns': list(df.columns),
+            'checkpoint': checkpoint.isoformat() if checkpoint is not None else None,
+            'count': snapshot.count.tolist(),
+            'mean': snapshot.mean.tolist(),
+            'm2': snapshot.m2.tolist()
+        }
+        results[spread_type] = frame
+
+    if types:
+        with open(state_path, 'w') as f:
+            json.dump({'source': source, 'windows': windows, 'types': types}, f, indent=2)
+    return results
+
+def load_rolling_stats(commodity: str, spread_type: str, config: SpreadsConfig,
+                       window: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """Stored rolling statistics of one spread type, optionally of one window only"""
+    path = os.path.join(config.PROCESSED_DATA_PATH, commodity, f'rolling_{spread_type}.parquet')
+    if not os.path.exists(path):
+        return None
+    stats = pd.read_parquet(path)
+    if window is not None:
+        stats = stats[[c for c in stats.columns if c.endswith(f'_{window}')]]
+    return stats
+
+def main():
+    """Build the rolling statistics of all commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        if update_rolling_stats(commodity, config):
+            print(f"Updated {commodity} rolling statistics")
+        else:
+            print(f"No spread data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
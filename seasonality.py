@@ -0,0 +1,213 @@
+# seasonality.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from typing import Dict, List, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from spreads_pyramid import get_source_key
+from contract_index import ContractIndex, load_contract_index
+
+# Seasonal studies per commodity, stored in processed_data/<COMMODITY>/seasonal/
+#   index.parquet - one row per date and month slot with the contract's
+#                   delivery year, delivery month, days to expiry and price
+#   paths.parquet - mean/median/count by days to expiry of every series
+#   bands.parquet - percentiles by calendar month of every series
+# Series are the prices of each delivery month (price_Z) and the
+# SpreadsConfig.SEASONAL_SPREADS delivery-month spreads (spread_Z-H).
+SEASONAL_PATH = 'seasonal'
+
+def get_seasonal_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity, SEASONAL_PATH)
+
+def delivery_months(contracts: pd.Index, expiry_dates: pd.DatetimeIndex,
+                    months: str) -> pd.DataFrame:
+    """
+    Delivery year and month of each contract from its ticker month code
+    and year digits; the century or decade comes from the expiry year.
+    """
+    parsed = pd.Series(contracts, dtype=object).str.extract(
+        rf'^.*?([{months}])(\d{{1,4}})(?:\s|$)')
+    delivery_month = parsed[0].map({code: i + 1 for i, code in enumerate(months)})
+    digits = pd.to_numeric(parsed[1], errors='coerce')
+    base = 10 ** parsed[1].str.len()
+
+    # Latest year ending in the ticker digits not after the expiry year,
+    # moved a cycle on if that is more than a year before expiry
+    expiry_year = pd.Series(expiry_dates.year, dtype=float)
+    delivery_year = expiry_year - (expiry_year - digits) % base
+    delivery_year = delivery_year.where(delivery_year >= expiry_year - 1, delivery_year + base)
+
+    return pd.DataFrame({
+        'delivery_year': delivery_year.to_numpy(),
+        'delivery_month': delivery_month.to_numpy(dtype=float)
+    }, index=contracts)
+
+def build_seasonal_index(monthly_futures: pd.DataFrame, days_to_expiry: pd.DataFrame,
+                         contract_index: ContractIndex, months: str) -> pd.DataFrame:
+    """
+    One row per date and filled month slot: slot, contract, delivery year,
+    delivery month, days to expiry and price. Rows are in date, slot order.
+    """
+    slots = [c[:-len('_future')] for c in monthly_futures.columns if c.endswith('_future')]
+    contract_dtype = pd.CategoricalDtype(contract_index.contracts)
+    codes = np.column_stack([monthly_futures[f'{s}_future'].astype(contract_dtype).cat.codes.to_numpy()
+                             for s in slots])
+    prices = monthly_futures[[f'{s}_price' for s in slots]].to_numpy(dtype=np.float64)
+    days = days_to_expiry.reindex(columns=[f'{s}_days' for s in slots]).to_numpy(
+        dtype=np.float64, na_value=np.nan)
+
+    rows, cols = np.nonzero(codes >= 0)
+    contract_codes = codes[rows, cols]
+    delivery = delivery_months(pd.Index(contract_index.contracts), contract_index.expiry_dates, months)
+
+    return pd.DataFrame({
+        'date': monthly_futures.index[rows],
+        'slot': (cols + 1).astype(np.int8),
+        'contract': pd.Categorical.from_codes(contract_codes, dtype=contract_dtype),
+        'delivery_year': pd.array(delivery['delivery_year'].to_numpy()[contract_codes], dtype='Int16'),
+        'delivery_month': pd.array(delivery['delivery_month'].to_numpy()[contract_codes], dtype='Int8'),
+        'days_to_expiry': pd.array(days[rows, cols], dtype='Int16'),
+        'price': prices[rows, cols]
+    })
+
+def delivery_spreads(seasonal_index: pd.DataFrame, near_code: str, far_code: str,
+                     months: str) -> pd.DataFrame:
+    """
+    Spread between a delivery month and the next following far month
+    (e.g. Z-H: December against the next March) on every date both are
+    quoted, keyed by the near contract's delivery year and days to expiry.
+    """
+    near_month = months.index(near_code) + 1
+    far_month = months.index(far_code) + 1
+    offset = (far_month - near_month) % 12 or 12
+
+    seasonal_index = seasonal_index.dropna(subset=['delivery_year', 'delivery_month'])
+    delivery_key = (seasonal_index['delivery_year'].astype('float64') * 12
+                    + seasonal_index['delivery_month'].astype('float64') - 1)
+    near = seasonal_index[seasonal_index['delivery_month'] == near_month].assign(
+        key=delivery_key + offset)
+    far = seasonal_index[seasonal_index['delivery_month'] == far_month].assign(key=delivery_key)
+
+    merged = near.merge(far[['date', 'key', 'price']], on=['date', 'key'], suffixes=('', '_far'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = merged['price_far'] - merged['price']
+        spread_pct = spread / merged['price'].where(merged['price'] != 0)
+    return pd.DataFrame({
+        'date': merged['date'],
+        'delivery_year': merged['delivery_year'],
+        'days_to_expiry': merged['days_to_expiry'],
+        'spread': spread,
+        'spread_pct': spread_pct
+    })
+
+def average_path(observations: pd.DataFrame, value: str) -> pd.DataFrame:
+    """Mean, median and number of delivery years of value by days to expiry"""
+    return observations.groupby('days_to_expiry')[value].agg(['mean', 'median', 'count'])
+
+def percentile_bands(observations: pd.DataFrame, value: str,
+                     percentiles: List[int]) -> pd.DataFrame:
+    """Percentiles of value per calendar month, one column per percentile"""
+    bands = observations.groupby(observations['date'].dt.month)[value].quantile(
+        [p / 100 for p in percentiles]).unstack()
+    bands.columns = [f'p{p}' for p in percentiles]
+    bands.index.name = 'month'
+    return bands
+
+def seasonal_series(seasonal_index: pd.DataFrame, config: SpreadsConfig,
+                    months: str) -> Dict[str, pd.DataFrame]:
+    """Observations of every price and configured spread series, with their value column"""
+    series = {}
+    for month, code in enumerate(months, start=1):
+        prices = seasonal_index[seasonal_index['delivery_month'] == month]
+        if len(prices):
+            series[f'price_{code}'] = prices.rename(columns={'price': 'value'})
+
+    for pair in config.SEASONAL_SPREADS:
+        near_code, far_code = pair.split('-')
+        spreads = delivery_spreads(seasonal_index, near_code, far_code, months)
+        if len(spreads):
+            series[f'spread_{pair}'] = spreads.rename(columns={'spread': 'value'})
+    return series
+
+def update_seasonality(commodity: str, raw_data_path: str, config: SpreadsConfig,
+                       months: str = FetchConfig.MONTHS) -> Optional[pd.DataFrame]:
+    """
+    Extend the seasonal index with the dates recalculated since the previous
+    run (INCREMENTAL_OVERLAP_DAYS back) and refresh the path and band
+    aggregates from it. Returns the index, None without spread data.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    seasonal_path = get_seasonal_path(commodity, config)
+    index_path = os.path.join(seasonal_path, 'index.parquet')
+    info_path = os.path.join(seasonal_path, 'seasonal_info.json')
+    futures_path = os.path.join(spread_path, 'monthly_futures.parquet')
+    contract_index = load_contract_index(commodity, raw_data_path)
+    if contract_index is None or not os.path.exists(futures_path):
+        return None
+    os.makedirs(seasonal_path, exist_ok=True)
+
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+    source = get_source_key(commodity, config)
+    incremental = (source is not None and info.get('source') == source
+                   and info.get('months') == months and os.path.exists(index_path))
+
+    monthly_futures = pd.read_parquet(futures_path)
+    days_to_expiry = pd.read_parquet(os.path.join(spread_path, 'days_to_expiry.parquet'))
+    kept = None
+    if incremental:
+        changed_from = pd.Timestamp(info['end']) - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
+        existing = pd.read_parquet(index_path)
+        kept = existing[existing['date'] < changed_from]
+        monthly_futures = monthly_futures[monthly_futures.index >= changed_from]
+        days_to_expiry = days_to_expiry[days_to_expiry.index >= changed_from]
+
+    recomputed = build_seasonal_index(monthly_futures, days_to_expiry, contract_index, months)
+    seasonal_index = recomputed if kept is None else pd.concat([kept, recomputed], ignore_index=True)
+    seasonal_index.to_parquet(index_path)
+
+    # Aggregates over the whole index, one group-by per series
+    series = seasonal_series(seasonal_index, config, months)
+    paths, bands = [], []
+    for name, observations in series.items():
+        paths.append(average_path(observations, 'value').reset_index().assign(series=name))
+        bands.append(percentile_bands(observations, 'value', config.SEASONAL_PERCENTILES)
+                     .reset_index().assign(series=name))
+    if paths:
+        pd.concat(paths, ignore_index=True).to_parquet(os.path.join(seasonal_path, 'paths.parquet'))
+        pd.concat(bands, ignore_index=True).to_parquet(os.path.join(seasonal_path, 'bands.parquet'))
+
+    with open(info_path, 'w') as f:
+        json.dump({'source': source, 'months': months,
+                   'end': seasonal_index['date'].max().isoformat(),
+                   'series': list(series)}, f, indent=2)
+    print(f"Updated {commodity} seasonality: {len(recomputed)} index rows recomputed, "
+          f"{len(series)} series")
+    return seasonal_index
+
+def load_seasonal(commodity: str, config: SpreadsConfig,
+                  table: str = 'paths') -> Optional[pd.DataFrame]:
+    """Cached seasonal 'index', 'paths' or 'bands' table, None if not built"""
+    path = os.path.join(get_seasonal_path(commodity, config), f'{table}.parquet')
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def main():
+    """Build the seasonal index and aggregates of all commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        if update_seasonality(commodity, fetch_config.RAW_DATA_PATH, config,
+                              fetch_config.MONTHS) is None:
+            print(f"No spread data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
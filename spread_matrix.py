@@ -0,0 +1,80 @@
+# spread_matrix.py
+
+import pandas as pd
+import numpy as np
+import os
+from typing import Optional
+from spreads_config import SpreadsConfig
+
+# Spreads between every pair of month slots, stored when
+# SpreadsConfig.CALCULATE_SPREAD_MATRIX is set as
+#   processed_data/<COMMODITY>/spread_matrix.parquet
+# with float32 columns spread_<i>_<j>m, spread_<i>_<j>m_pct and
+# spread_<i>_<j>m_pct_annual for i < j (the upper triangle).
+SPREAD_MATRIX_FILE = 'spread_matrix.parquet'
+SPREAD_KINDS = {
+    'dollar': '',
+    'percent': '_pct',
+    'annual': '_pct_annual'
+}
+
+def pair_column(near: int, far: int, kind: str = 'dollar') -> str:
+    """Column of the near-far spread of one kind"""
+    if kind not in SPREAD_KINDS:
+        raise ValueError(f"Unknown spread kind {kind}, expected one of {list(SPREAD_KINDS)}")
+    if not 1 <= near < far:
+        raise ValueError(f"Pairs need 1 <= near < far, got {near}-{far}")
+    return f"spread_{near}_{far}m{SPREAD_KINDS[kind]}"
+
+def build_spread_matrix(month_prices: np.ndarray, month_days: np.ndarray,
+                        index: pd.DatetimeIndex, config: SpreadsConfig) -> pd.DataFrame:
+    """
+    Dollar, percent and annualized spreads of every slot pair, broadcast
+    over the (dates, slots) price matrix. Same rules as the front spreads:
+    no value where the near price is zero or either contract expires that day.
+    """
+    n_slots = month_prices.shape[1]
+    near, far = np.triu_indices(n_slots, k=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dollar = (month_prices[:, None, :] - month_prices[:, :, None])[:, near, far]
+        near_prices = month_prices[:, near]
+        days_difference = (month_days[:, None, :] - month_days[:, :, None])[:, near, far]
+        usable = (near_prices != 0) & (month_days[:, near] != 0) & (month_days[:, far] != 0)
+
+        dollar = np.where(usable, dollar, np.nan)
+        percent = dollar / near_prices
+        annual = np.where(days_difference > 0,
+                          percent * (config.TRADING_DAYS_PER_YEAR / days_difference),
+                          np.nan)
+
+    columns = {}
+    for kind, values in [('dollar', dollar), ('percent', percent), ('annual', annual)]:
+        for k, (i, j) in enumerate(zip(near + 1, far + 1)):
+            columns[pair_column(i, j, kind)] = values[:, k].astype(np.float32)
+    return pd.DataFrame(columns, index=index)
+
+def get_spread_matrix_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity, SPREAD_MATRIX_FILE)
+
+def load_spread_pair(commodity: str, config: SpreadsConfig, near: int, far: int,
+                     kind: str = 'dollar') -> Optional[pd.Series]:
+    """One pair's spread series, reading only its column; None if not stored"""
+    path = get_spread_matrix_path(commodity, config)
+    if not os.path.exists(path):
+        return None
+    column = pair_column(near, far, kind)
+    return pd.read_parquet(path, columns=[column])[column]
+
+def load_butterfly(commodity: str, config: SpreadsConfig, near: int, middle: int,
+                   far: int) -> Optional[pd.Series]:
+    """
+    Dollar butterfly near - 2 * middle + far, from the two adjacent pair
+    columns. None if the matrix is not stored.
+    """
+    path = get_spread_matrix_path(commodity, config)
+    if not os.path.exists(path):
+        return None
+    near_leg, far_leg = pair_column(near, middle), pair_column(middle, far)
+    legs = pd.read_parquet(path, columns=[near_leg, far_leg])
+    return (legs[far_leg] - legs[near_leg]).rename(f"butterfly_{near}_{middle}_{far}m")
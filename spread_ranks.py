@@ -0,0 +1,211 @@
+# spread_ranks.py
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from typing import Dict, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+from spreads_pyramid import get_source_key
+
+# Sorted history of every spread column per lookback window, stored as
+#   processed_data/<COMMODITY>/ranks/<TYPE>_<WINDOW>.parquet
+# one column per spread, values ascending with NaN padding at the end.
+# Windows are calendar days back from the last date, None for all history.
+RANK_WINDOWS = {
+    '1y': 365,
+    '5y': 1826,
+    'all': None
+}
+
+RANKED_SPREAD_FILES = {
+    'dollar': 'spreads_dollar.parquet',
+    'percent': 'spreads_percent.parquet',
+    'annual': 'spreads_annual.parquet'
+}
+
+class SpreadRanks:
+    """
+    Sorted values of each spread column over one window. Percentile ranks
+    and z-scores of new values are binary searches on the sorted arrays
+    instead of a sort or quantile over the history.
+    """
+
+    def __init__(self, sorted_values: pd.DataFrame):
+        self.columns = list(sorted_values.columns)
+        self.values = {column: sorted_values[column].dropna().to_numpy(dtype=np.float64)
+                       for column in self.columns}
+        self.mean = {column: values.mean() if len(values) else np.nan
+                     for column, values in self.values.items()}
+        self.std = {column: values.std() if len(values) > 1 else np.nan
+                    for column, values in self.values.items()}
+
+    def percentile(self, latest: pd.Series) -> pd.Series:
+        """Percentile rank (0-100, ties counted half) of each column's value"""
+        ranks = {}
+        for column in self.columns:
+            values = self.values[column]
+            value = latest.get(column, np.nan)
+            if not len(values) or pd.isna(value):
+                ranks[column] = np.nan
+                continue
+            below = np.searchsorted(values, value, side='left')
+            at_or_below = np.searchsorted(values, value, side='right')
+            ranks[column] = 50.0 * (below + at_or_below) / len(values)
+        return pd.Series(ranks, dtype=np.float64)
+
+    def zscore(self, latest: pd.Series) -> pd.Series:
+        """Standard deviations of each column's value from its window mean"""
+        means = pd.Series(self.mean, dtype=np.float64)
+        stds = pd.Series(self.std, dtype=np.float64)
+        return (latest.reindex(self.columns).astype(np.float64) - means) / stds.where(stds > 0)
+
+def window_start(end: pd.Timestamp, window: str) -> Optional[pd.Timestamp]:
+    """Dates after this are in the window ending at end, None for all"""
+    days = RANK_WINDOWS[window]
+    return None if days is None else end - pd.Timedelta(days=days)
+
+def remove_sorted(sorted_values: np.ndarray, removed: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Drop one occurrence of each removed value from a sorted array. None if
+    a value is not in the array, meaning the stored history no longer
+    matches the spreads it was built from.
+    """
+    removed = np.sort(removed[~np.isnan(removed)])
+    if not len(removed):
+        return sorted_values
+    # Repeated values take consecutive positions
+    repeat = np.arange(len(removed)) - np.searchsorted(removed, removed, side='left')
+    positions = np.searchsorted(sorted_values, removed, side='left') + repeat
+    found = positions < len(sorted_values)
+    if not found.all() or not np.array_equal(sorted_values[positions], removed):
+        return None
+    return np.delete(sorted_values, positions)
+
+def insert_sorted(sorted_values: np.ndarray, added: np.ndarray) -> np.ndarray:
+    """Insert values into a sorted array, keeping it sorted"""
+    added = np.sort(added[~np.isnan(added)])
+    return np.insert(sorted_values, np.searchsorted(sorted_values, added), added)
+
+def to_sorted_frame(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Sorted arrays of different lengths as one NaN-padded frame"""
+    length = max((len(values) for values in columns.values()), default=0)
+    return pd.DataFrame({column: np.pad(values, (0, length - len(values)), constant_values=np.nan)
+                         for column, values in columns.items()})
+
+def get_ranks_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity, 'ranks')
+
+def update_spread_ranks(commodity: str, config: SpreadsConfig) -> Dict[str, Dict[str, SpreadRanks]]:
+    """
+    Build or update the sorted windows of a commodity's spreads. Values of
+    the last INCREMENTAL_OVERLAP_DAYS are kept aside so a later update can
+    take them out again if they were recalculated; dates leaving a window
+    are removed and new dates inserted with binary searches. Returns the
+    ranks per spread type and window.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    ranks_path = get_ranks_path(commodity, config)
+    info_path = os.path.join(ranks_path, 'ranks_info.json')
+    os.makedirs(ranks_path, exist_ok=True)
+
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+    source = get_source_key(commodity, config)
+    incremental = source is not None and info.get('source') == source
+
+    ranks = {}
+    columns = {}
+    end = None
+    for spread_type, filename in RANKED_SPREAD_FILES.items():
+        source_path = os.path.join(spread_path, filename)
+        if not os.path.exists(source_path):
+            continue
+        df = pd.read_parquet(source_path).astype(np.float64)
+        end = df.index.max()
+        tail_start = end - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
+        tail_path = os.path.join(ranks_path, f'{spread_type}_tail.parquet')
+        columns[spread_type] = list(df.columns)
+
+        type_incremental = (incremental and info.get('columns', {}).get(spread_type) == columns[spread_type]
+                            and os.path.exists(tail_path))
+        if type_incremental:
+            previous_end = pd.Timestamp(info['end'])
+            old_tail = pd.read_parquet(tail_path).reindex(columns=df.columns)
+            old_tail_start = old_tail.index.min() if len(old_tail) else previous_end
+            new_rows = df[df.index >= old_tail_start]
+
+        ranks[spread_type] = {}
+        for window in RANK_WINDOWS:
+            level_path = os.path.join(ranks_path, f'{spread_type}_{window}.parquet')
+            start = window_start(end, window)
+            in_window = df.index > start if start is not None else np.ones(len(df), dtype=bool)
+
+            if type_incremental and os.path.exists(level_path):
+                existing = pd.read_parquet(level_path)
+                previous_start = window_start(previous_end, window)
+
+                # Unchanged dates that left the window since the previous update
+                left = np.zeros(len(df), dtype=bool)
+                if start is not None:
+                    left = (df.index <= start) & (df.index < old_tail_start)
+                    if previous_start is not None:
+                        left &= df.index > previous_start
+                removed = np.vstack([old_tail.to_numpy(), df.to_numpy()[left]])
+                added = new_rows.to_numpy()[in_window[df.index >= old_tail_start]]
+
+                sorted_columns = {}
+                for i, column in enumerate(df.columns):
+                    values = existing[column].to_numpy()
+                    values = remove_sorted(values[~np.isnan(values)], removed[:, i])
+                    if values is None:
+                        print(f"{commodity} {spread_type} {window} ranks out of date, rebuilding window")
+                        sorted_columns = None
+                        break
+                    sorted_columns[column] = insert_sorted(values, added[:, i])
+                sorted_frame = to_sorted_frame(sorted_columns) if sorted_columns is not None else None
+            else:
+                sorted_frame = None
+
+            if sorted_frame is None:
+                sorted_frame = pd.DataFrame(np.sort(df[in_window].to_numpy(), axis=0),
+                                            columns=df.columns)
+                sorted_frame = sorted_frame.dropna(how='all')
+
+            sorted_frame.to_parquet(level_path)
+            ranks[spread_type][window] = SpreadRanks(sorted_frame)
+
+        df[df.index >= tail_start].to_parquet(tail_path)
+
+    if end is not None:
+        with open(info_path, 'w') as f:
+            json.dump({'source': source, 'end': end.isoformat(),
+                       'windows': RANK_WINDOWS, 'columns': columns}, f, indent=2)
+    return ranks
+
+def load_spread_ranks(commodity: str, spread_type: str, window: str,
+                      config: SpreadsConfig) -> Optional[SpreadRanks]:
+    """Stored ranks of one spread type and window, None if not built"""
+    path = os.path.join(get_ranks_path(commodity, config), f'{spread_type}_{window}.parquet')
+    if not os.path.exists(path):
+        return None
+    return SpreadRanks(pd.read_parquet(path))
+
+def main():
+    """Build the sorted windows of all commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        if os.path.exists(os.path.join(config.PROCESSED_DATA_PATH, commodity, 'spread_info.json')):
+            update_spread_ranks(commodity, config)
+            print(f"Updated {commodity} spread ranks")
+        else:
+            print(f"No spread data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
@@ -3,137 +3,396 @@ import numpy as np
 from datetime import datetime
 import os
 import json
-from typing import Dict, Tuple, List
-from tqdm import tqdm
+import hashlib
+from typing import Dict, Tuple, List, Optional
 from spreads_config import SpreadsConfig
+from contract_index import ContractIndex, to_day_numbers, metadata_last_trade_date
+from raw_store import raw_data_exists, load_raw_data, get_raw_data_summary
+from spread_matrix import build_spread_matrix
 
 def get_last_trade_dates(metadata: Dict) -> Dict[str, datetime]:
     """Extract last trade dates from metadata"""
-    last_trade_dates = {}
-    for contract, info in metadata.items():
-        try:
-            last_trade_dates[contract] = pd.to_datetime(info['last_trade_date'])
-        except:
-            continue
-    return last_trade_dates
+    return ContractIndex.from_metadata(metadata).last_trade_dates()
 
 def calculate_days_to_expiry(date: datetime, 
                            last_trade_dates: Dict[str, datetime],
                            min_days: int = 0) -> Dict[str, int]:
     """Calculate days to expiry for each contract from a given date"""
-    days_to_expiry = {}
-    for contract, last_trade_date in last_trade_dates.items():
-        if pd.notna(last_trade_date) and last_trade_date >= date:
-            days = (last_trade_date - date).days
-            if days >= min_days:
-                days_to_expiry[contract] = days
-    return days_to_expiry
+    return ContractIndex.from_last_trade_dates(last_trade_dates).contracts_on(date, min_days)
+
+def average_volumes(volumes_df: pd.DataFrame, prices_df: pd.DataFrame,
+                    window: int = 1) -> np.ndarray:
+    """
+    Mean volume over the last `window` trading days of every price column
+    on every price date, shape (dates, contracts). Missing volumes count as
+    no trading.
+    """
+    volumes = volumes_df.reindex(columns=prices_df.columns).fillna(0.0).to_numpy(dtype=np.float64)
+    if window > 1:
+        # Rolling sums from a cumulative sum, averaged over the rows available
+        totals = np.cumsum(volumes, axis=0)
+        totals[window:] = totals[window:] - totals[:-window].copy()
+        counts = np.minimum(np.arange(1, len(volumes) + 1), window)
+        volumes = totals / counts[:, None]
+    
+    rows = volumes_df.index.get_indexer(prices_df.index)
+    padded = np.vstack([volumes, np.zeros((1, volumes.shape[1]))])
+    return padded[rows]
+
+def liquidity_mask(prices_df: pd.DataFrame, volumes_df: Optional[pd.DataFrame],
+                   config: SpreadsConfig) -> Optional[np.ndarray]:
+    """
+    Where each contract's average volume reaches MIN_VOLUME, aligned with
+    prices_df. None if the volume filter is disabled.
+    """
+    if volumes_df is None or config.MIN_VOLUME <= 0:
+        return None
+    return average_volumes(volumes_df, prices_df, config.VOLUME_WINDOW) >= config.MIN_VOLUME
+
+def load_liquidity_volumes(commodity: str, raw_data_path: str, config: SpreadsConfig,
+                           start_date: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+    """Volumes needed by the MIN_VOLUME filter, None if it is disabled"""
+    if config.MIN_VOLUME <= 0:
+        return None
+    if start_date is not None:
+        # Earlier rows filling the averaging window of the first date
+        start_date = start_date - pd.Timedelta(days=2 * config.VOLUME_WINDOW + 7)
+    return load_raw_data(commodity, raw_data_path, kind='volumes', start_date=start_date)
+
+def liquidity_settings(config: SpreadsConfig) -> Dict:
+    """Filter settings a spread calculation depends on"""
+    return {
+        'min_days_to_expiry': config.MIN_DAYS_TO_EXPIRY,
+        'min_volume': config.MIN_VOLUME,
+        'volume_window': config.VOLUME_WINDOW if config.MIN_VOLUME > 0 else None
+    }
+
+def build_term_structure(prices_df: pd.DataFrame,
+                         contract_index: ContractIndex,
+                         max_months: int,
+                         min_days: int = 0,
+                         liquid: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select the nearest contracts with a price on every date, skipping
+    contracts with fewer than min_days to expiry and, if given, where the
+    liquid mask (aligned with prices_df) is False.
+    Returns (contract_idx, prices, days) arrays of shape (dates, max_months);
+    contract_idx points into prices_df.columns and is -1 for empty slots.
+    """
+    n_dates = len(prices_df.index)
+    prices = prices_df.to_numpy(dtype=np.float64)
+    
+    # Columns in expiry order, dropping contracts without a last trade date;
+    # contracts expiring on the same day keep their column order
+    positions = contract_index.positions(prices_df.columns)
+    known = np.flatnonzero(positions >= 0)
+    column_expiry = contract_index.expiry_days[positions[known]]
+    order = known[np.argsort(column_expiry, kind='stable')]
+    sorted_expiry = contract_index.expiry_days[positions[order]]
+    sorted_prices = prices[:, order]
+    
+    # A contract is live until min_days before its expiry
+    date_days = to_day_numbers(prices_df.index)
+    valid = ~np.isnan(sorted_prices) & (sorted_expiry[None, :] >= (date_days + min_days)[:, None])
+    if liquid is not None:
+        valid &= liquid[:, order]
+    
+    # Rank of each valid contract within its date decides its month slot
+    rank = np.cumsum(valid, axis=1)
+    rows, cols = np.nonzero(valid & (rank <= max_months))
+    slots = rank[rows, cols] - 1
+    
+    contract_idx = np.full((n_dates, max_months), -1, dtype=np.int64)
+    month_prices = np.full((n_dates, max_months), np.nan)
+    month_days = np.full((n_dates, max_months), np.nan)
+    contract_idx[rows, slots] = order[cols]
+    month_prices[rows, slots] = sorted_prices[rows, cols]
+    month_days[rows, slots] = sorted_expiry[cols] - date_days[rows]
+    
+    return contract_idx, month_prices, month_days
+
+def interpolate_tenors(month_prices: np.ndarray, month_days: np.ndarray,
+                      tenors: List[int]) -> np.ndarray:
+    """
+    Prices at fixed days to expiry, shape (dates, tenors), interpolated
+    linearly between the two month slots around each tenor on every date.
+    Tenors outside the quoted slots of a date are NaN.
+    """
+    tenors = np.asarray(tenors, dtype=np.float64)
+    rows = np.arange(len(month_days))[:, None]
+    filled = ~np.isnan(month_days)
+    
+    # Slots are filled from the front in expiry order, so the number of
+    # slots expiring by a tenor gives the slot just before it
+    left = (filled[:, :, None] & (month_days[:, :, None] <= tenors)).sum(axis=1) - 1
+    right = np.minimum(left + 1, month_days.shape[1] - 1)
+    left = np.maximum(left, 0)
+    
+    left_days = month_days[rows, left]
+    right_days = month_days[rows, right]
+    left_prices = month_prices[rows, left]
+    right_prices = month_prices[rows, right]
+    
+    exact = left_days == tenors
+    inside = (left_days < tenors) & (right_days > tenors)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = (tenors - left_days) / (right_days - left_days)
+        interpolated = left_prices + weight * (right_prices - left_prices)
+    return np.where(exact, left_prices, np.where(inside, interpolated, np.nan))
+
+def constant_maturity_frame(month_prices: np.ndarray, month_days: np.ndarray,
+                            index: pd.DatetimeIndex, config: SpreadsConfig) -> pd.DataFrame:
+    """
+    Constant-maturity prices cm_<T>d and spreads of every tenor against the
+    shortest one, in dollars, percent and annualized percent.
+    """
+    tenors = sorted(config.CONSTANT_MATURITY_TENORS)
+    curve = interpolate_tenors(month_prices, month_days, tenors)
+    
+    columns = {f"cm_{tenor}d": curve[:, i] for i, tenor in enumerate(tenors)}
+    near = curve[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, tenor in enumerate(tenors[1:], start=1):
+            name = f"cm_spread_{tenors[0]}_{tenor}d"
+            dollar = curve[:, i] - near
+            percent = np.where(near != 0, dollar / near, np.nan)
+            columns[name] = dollar
+            columns[f"{name}_pct"] = percent
+            columns[f"{name}_pct_annual"] = percent * (config.TRADING_DAYS_PER_YEAR / (tenor - tenors[0]))
+    return pd.DataFrame(columns, index=index)
+
+def apply_dtype_policy(df: pd.DataFrame, config: SpreadsConfig,
+                       contract_dtype: Optional[pd.CategoricalDtype] = None,
+                       float_dtype=None) -> pd.DataFrame:
+    """
+    Compact column types of a spread output frame: contract columns become
+    categoricals over the commodity's contract table, day counts nullable
+    Int16, prices and spreads float32 if FLOAT32_OUTPUTS is set or
+    float_dtype otherwise.
+    """
+    if float_dtype is None:
+        float_dtype = np.float32 if config.FLOAT32_OUTPUTS else np.float64
+    dtypes = {}
+    for column in df.columns:
+        if column.endswith('_future'):
+            dtypes[column] = contract_dtype if contract_dtype is not None else 'category'
+        elif column.endswith('_days'):
+            dtypes[column] = 'Int16'
+        else:
+            dtypes[column] = float_dtype
+    return df.astype(dtypes)
+
+def get_contract_dtype(monthly_futures: pd.DataFrame) -> Optional[pd.CategoricalDtype]:
+    """Categorical dtype shared by the contract columns, if any"""
+    for column in monthly_futures.columns:
+        dtype = monthly_futures[column].dtype
+        if column.endswith('_future') and isinstance(dtype, pd.CategoricalDtype):
+            return dtype
+    return None
 
 def create_monthly_futures_data(prices_df: pd.DataFrame, 
                               metadata: Dict,
-                              config: SpreadsConfig) -> Tuple[pd.DataFrame, ...]:
-    """Create monthly futures data and calculate spreads"""
+                              config: SpreadsConfig,
+                              start_date: Optional[datetime] = None,
+                              volumes_df: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, ...]:
+    """
+    Create monthly futures data and calculate spreads.
+    If start_date is given, only dates from start_date onwards are processed.
+    Contracts below MIN_VOLUME (averaged over VOLUME_WINDOW days of
+    volumes_df) or MIN_DAYS_TO_EXPIRY do not take a month slot.
+    """
+    if start_date is not None:
+        prices_df = prices_df[prices_df.index >= start_date]
+        
     print("\nProcessing spreads...")
     print(f"Data range: {prices_df.index.min().date()} to {prices_df.index.max().date()}")
     
-    # Get last trade dates for all contracts
-    last_trade_dates = get_last_trade_dates(metadata)
+    # Expiry-sorted index of all contracts
+    contract_index = ContractIndex.from_metadata(metadata)
     
-    # Initialize result dataframes
-    monthly_futures = pd.DataFrame(index=prices_df.index)
-    spreads_dollar = pd.DataFrame(index=prices_df.index)
-    spreads_percent = pd.DataFrame(index=prices_df.index)
-    spreads_percent_annual = pd.DataFrame(index=prices_df.index)
-    days_to_expiry_df = pd.DataFrame(index=prices_df.index)
+    print(f"Processing {len(prices_df.index)} dates...")
+    liquid = liquidity_mask(prices_df, volumes_df, config)
+    contract_idx, month_prices, month_days = build_term_structure(
+        prices_df, contract_index, config.MAX_MONTHS_FORWARD,
+        config.MIN_DAYS_TO_EXPIRY, liquid)
     
-    # Pre-calculate valid contracts and their expiry dates for each date
-    print("Pre-processing contract data...")
-    date_contracts_map = {}
+    index = prices_df.index
+    filled = contract_idx >= 0
     
-    for date in tqdm(prices_df.index, desc="Analyzing dates"):
-        # Get valid contracts for this date (non-NaN prices)
-        valid_contracts = [c for c in prices_df.columns 
-                         if pd.notna(prices_df.at[date, c])]
-        
-        if not valid_contracts:
-            continue
-            
-        # Calculate days to expiry and filter contracts
-        days_to_expiry = calculate_days_to_expiry(date, last_trade_dates)
-        valid_contracts = [(c, days_to_expiry[c]) for c in valid_contracts 
-                          if c in days_to_expiry]
-        
-        if valid_contracts:
-            # Sort by days to expiry
-            date_contracts_map[date] = sorted(valid_contracts, 
-                                            key=lambda x: x[1])
+    # Contracts are stored as codes into the expiry-sorted contract table
+    contract_dtype = pd.CategoricalDtype(contract_index.contracts)
+    codes = np.where(filled, contract_index.positions(prices_df.columns)[contract_idx], -1)
     
-    print(f"Processing {len(prices_df.index)} dates...")
-    for date in tqdm(prices_df.index, desc="Calculating spreads"):
-        if date not in date_contracts_map:
-            continue
+    # Store contract, price and days to expiry for each month slot in use
+    monthly_futures = {}
+    days_to_expiry = {}
+    for i in np.flatnonzero(filled.any(axis=0)):
+        monthly_futures[f"month_{i+1}_future"] = pd.Categorical.from_codes(
+            codes[:, i], dtype=contract_dtype)
+        monthly_futures[f"month_{i+1}_price"] = month_prices[:, i]
+        days_to_expiry[f"month_{i+1}_days"] = month_days[:, i]
+    
+    # Spreads of every later month against month 1, skipping dates where
+    # the front price is zero or either contract expires that day
+    m1_price = month_prices[:, :1]
+    m1_days = month_days[:, :1]
+    far_prices = month_prices[:, 1:]
+    far_days = month_days[:, 1:]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        usable = filled[:, 1:] & (m1_price != 0) & (far_days != 0) & (m1_days != 0)
+        dollar = np.where(usable, far_prices - m1_price, np.nan)
+        percent = dollar / m1_price
+        days_difference = far_days - m1_days
+        annual_usable = usable & (days_difference > 0)
+        annual = np.where(annual_usable,
+                          percent * (config.TRADING_DAYS_PER_YEAR / days_difference),
+                          np.nan)
+    
+    spreads_dollar = {}
+    spreads_percent = {}
+    spreads_percent_annual = {}
+    for i in range(far_prices.shape[1]):
+        if usable[:, i].any():
+            spreads_dollar[f"spread_1_{i+2}m"] = dollar[:, i]
+            spreads_percent[f"spread_1_{i+2}m_pct"] = percent[:, i]
+        if annual_usable[:, i].any():
+            spreads_percent_annual[f"spread_1_{i+2}m_pct_annual"] = annual[:, i]
+    
+    # Fixed-tenor curve, free of the roll-to-roll drift of the month slots
+    constant_maturity = constant_maturity_frame(month_prices, month_days, index, config)
+    
+    # Optional spreads of every month pair, always float32
+    spread_matrix = None
+    if config.CALCULATE_SPREAD_MATRIX:
+        spread_matrix = build_spread_matrix(month_prices, month_days, index, config)
+    
+    print("Spread calculations complete")
+    frames = (monthly_futures, spreads_dollar, spreads_percent,
+              spreads_percent_annual, days_to_expiry, constant_maturity)
+    return tuple(apply_dtype_policy(pd.DataFrame(frame, index=index), config, contract_dtype)
+                 for frame in frames) + (spread_matrix,)
+
+SPREAD_FILES = {
+    'monthly_futures': 'monthly_futures.parquet',
+    'spreads_dollar': 'spreads_dollar.parquet',
+    'spreads_percent': 'spreads_percent.parquet',
+    'spreads_annual': 'spreads_annual.parquet',
+    'days_to_expiry': 'days_to_expiry.parquet',
+    'constant_maturity': 'constant_maturity.parquet',
+    'spread_matrix': 'spread_matrix.parquet'
+}
+
+# Outputs stored with a fixed float type regardless of FLOAT32_OUTPUTS
+FLOAT_DTYPES = {
+    'spread_matrix': np.float32
+}
+
+def stored_spread_files(config: SpreadsConfig) -> Dict[str, str]:
+    """Spread outputs written under the given config"""
+    return {name: filename for name, filename in SPREAD_FILES.items()
+            if name != 'spread_matrix' or config.CALCULATE_SPREAD_MATRIX}
+
+# Filter settings of outputs written before liquidity filters were recorded
+UNFILTERED = liquidity_settings(SpreadsConfig())
+
+def hash_metadata(metadata: Dict) -> str:
+    """Stable fingerprint of the contract expiries in metadata"""
+    expiries = {contract: metadata_last_trade_date(info) for contract, info in metadata.items()}
+    return hashlib.sha256(json.dumps(expiries, sort_keys=True).encode()).hexdigest()
+
+def get_incremental_start(commodity: str, history_start: datetime, metadata: Dict,
+                          config: SpreadsConfig) -> Optional[datetime]:
+    """
+    Return the first date to recompute for an incremental update, or None
+    if a full rebuild is needed (no previous run, changed config/metadata).
+    """
+    if not config.INCREMENTAL:
+        return None
         
-        # Get pre-calculated contracts for this date
-        ordered_contracts = date_contracts_map[date]
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    info_path = os.path.join(spread_path, 'spread_info.json')
+    
+    if not os.path.exists(info_path):
+        return None
+    if not all(os.path.exists(os.path.join(spread_path, f))
+               for f in stored_spread_files(config).values()):
+        return None
         
-        # Store prices and days to expiry for each month
-        for i, (contract, days) in enumerate(ordered_contracts, 1):
-            if i > config.MAX_MONTHS_FORWARD:
-                break
-            monthly_futures.at[date, f"month_{i}_future"] = contract
-            monthly_futures.at[date, f"month_{i}_price"] = prices_df.at[date, contract]
-            days_to_expiry_df.at[date, f"month_{i}_days"] = days
+    try:
+        with open(info_path, 'r') as f:
+            info = json.load(f)
         
-        # Calculate spreads if we have at least two months
-        if len(ordered_contracts) >= 2:
-            m1_contract, m1_days = ordered_contracts[0]
-            m1_price = prices_df.at[date, m1_contract]
+        if (info.get('max_months_forward') != config.MAX_MONTHS_FORWARD or
+                info.get('trading_days_per_year') != config.TRADING_DAYS_PER_YEAR or
+                info.get('constant_maturity_tenors') != sorted(config.CONSTANT_MATURITY_TENORS) or
+                info.get('spread_matrix', False) != config.CALCULATE_SPREAD_MATRIX or
+                info.get('float32_outputs', False) != config.FLOAT32_OUTPUTS or
+                info.get('liquidity', UNFILTERED) != liquidity_settings(config)):
+            print("Spread config changed, full rebuild required")
+            return None
+        if info.get('metadata_hash') != hash_metadata(metadata):
+            print("Contract metadata changed, full rebuild required")
+            return None
+        if pd.Timestamp(info['date_range']['start']) != pd.Timestamp(history_start):
+            print("Price history start changed, full rebuild required")
+            return None
             
-            # Calculate spreads for subsequent months
-            for i in range(1, min(len(ordered_contracts), config.MAX_MONTHS_FORWARD)):
-                far_contract, far_days = ordered_contracts[i]
-                far_price = prices_df.at[date, far_contract]
-                
-                if m1_price != 0 and far_days and m1_days:
-                    # Dollar spreads
-                    dollar_spread = far_price - m1_price
-                    spreads_dollar.at[date, f"spread_1_{i+1}m"] = dollar_spread
-                    
-                    # Percentage spreads
-                    pct_spread = dollar_spread / m1_price
-                    spreads_percent.at[date, f"spread_1_{i+1}m_pct"] = pct_spread
-                    
-                    # Annualized percentage spreads
-                    days_difference = far_days - m1_days
-                    if days_difference > 0:
-                        annual_factor = config.TRADING_DAYS_PER_YEAR / days_difference
-                        annual_spread = pct_spread * annual_factor
-                        spreads_percent_annual.at[date, f"spread_1_{i+1}m_pct_annual"] = annual_spread
+        last_date = pd.Timestamp(info['date_range']['end'])
+    except Exception as e:
+        print(f"Error reading spread info, full rebuild required: {e}")
+        return None
     
-    print("Spread calculations complete")
-    return (monthly_futures, spreads_dollar, spreads_percent, 
-            spreads_percent_annual, days_to_expiry_df)
+    return last_date - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
 
 def save_spread_data(commodity: str, spread_data: Tuple[pd.DataFrame, ...], 
-                    config: SpreadsConfig):
-    """Save calculated spread data"""
+                    config: SpreadsConfig, metadata: Optional[Dict] = None,
+                    append: bool = False):
+    """
+    Save calculated spread data.
+    With append=True the rows replace the tail of the existing files instead
+    of overwriting them.
+    """
     # Create directory if it doesn't exist
     spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
     os.makedirs(spread_path, exist_ok=True)
     
-    # Unpack spread data
-    (monthly_futures, spreads_dollar, spreads_percent, 
-     spreads_percent_annual, days_to_expiry) = spread_data
+    frames = dict(zip(SPREAD_FILES, spread_data))
+    stored = stored_spread_files(config)
+    
+    # Merge with existing rows before the first recomputed date, restoring
+    # the compact types where older files were stored differently
+    if append:
+        cutoff = frames['monthly_futures'].index.min()
+        contract_dtype = get_contract_dtype(frames['monthly_futures'])
+        for name, filename in stored.items():
+            existing = pd.read_parquet(os.path.join(spread_path, filename))
+            if pd.notna(cutoff):
+                frames[name] = pd.concat([existing[existing.index < cutoff], frames[name]])
+            else:
+                frames[name] = existing
+            frames[name] = apply_dtype_policy(frames[name], config, contract_dtype,
+                                              FLOAT_DTYPES.get(name))
+        print(f"Appended {len(spread_data[0])} recalculated dates to existing spread data")
+    
+    # Save all dataframes to parquet format, dropping disabled outputs
+    for name, filename in SPREAD_FILES.items():
+        if name in stored:
+            frames[name].to_parquet(os.path.join(spread_path, filename))
+        elif os.path.exists(os.path.join(spread_path, filename)):
+            os.remove(os.path.join(spread_path, filename))
     
-    # Save all dataframes to parquet format
-    monthly_futures.to_parquet(os.path.join(spread_path, 'monthly_futures.parquet'))
-    spreads_dollar.to_parquet(os.path.join(spread_path, 'spreads_dollar.parquet'))
-    spreads_percent.to_parquet(os.path.join(spread_path, 'spreads_percent.parquet'))
-    spreads_percent_annual.to_parquet(os.path.join(spread_path, 'spreads_annual.parquet'))
-    days_to_expiry.to_parquet(os.path.join(spread_path, 'days_to_expiry.parquet'))
+    monthly_futures = frames['monthly_futures']
+    
+    # Stores derived from the spreads are rebuilt after every full write
+    info_path = os.path.join(spread_path, 'spread_info.json')
+    full_write = datetime.now().isoformat()
+    if append and os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            full_write = json.load(f).get('full_write')
     
     # Save calculation info
-    with open(os.path.join(spread_path, 'spread_info.json'), 'w') as f:
+    with open(info_path, 'w') as f:
         json.dump({
             'last_calculation': datetime.now().isoformat(),
             'date_range': {
@@ -141,12 +400,18 @@ def save_spread_data(commodity: str, spread_data: Tuple[pd.DataFrame, ...],
                 'end': monthly_futures.index.max().isoformat()
             },
             'spread_counts': {
-                'dollar': len(spreads_dollar.columns),
-                'percent': len(spreads_percent.columns),
-                'annual': len(spreads_percent_annual.columns)
+                'dollar': len(frames['spreads_dollar'].columns),
+                'percent': len(frames['spreads_percent'].columns),
+                'annual': len(frames['spreads_annual'].columns)
             },
             'max_months_forward': config.MAX_MONTHS_FORWARD,
-            'trading_days_per_year': config.TRADING_DAYS_PER_YEAR
+            'trading_days_per_year': config.TRADING_DAYS_PER_YEAR,
+            'liquidity': liquidity_settings(config),
+            'constant_maturity_tenors': sorted(config.CONSTANT_MATURITY_TENORS),
+            'spread_matrix': config.CALCULATE_SPREAD_MATRIX,
+            'float32_outputs': config.FLOAT32_OUTPUTS,
+            'full_write': full_write,
+            'metadata_hash': hash_metadata(metadata) if metadata is not None else None
         }, f, indent=2)
 
 def main():
@@ -159,23 +424,30 @@ def main():
     
     # Load raw data (example for one commodity)
     commodity_path = os.path.join(config.RAW_DATA_PATH, 'CL')
-    prices_path = os.path.join(commodity_path, 'prices.parquet')
     metadata_path = os.path.join(commodity_path, 'metadata.json')
     
-    if os.path.exists(prices_path) and os.path.exists(metadata_path):
-        prices_df = pd.read_parquet(prices_path)
+    if raw_data_exists('CL', config.RAW_DATA_PATH) and os.path.exists(metadata_path):
         with open(metadata_path, 'r') as f:
             metadata = json.load(f)
             
+        # Only recalculate new dates if nothing else changed
+        summary = get_raw_data_summary('CL', config.RAW_DATA_PATH)
+        start_date = get_incremental_start('CL', summary['start_date'], metadata, config)
+        prices_df = load_raw_data('CL', config.RAW_DATA_PATH, start_date=start_date)
+        volumes_df = load_liquidity_volumes('CL', config.RAW_DATA_PATH, config, start_date)
+        
         # Calculate spreads
         spread_data = create_monthly_futures_data(
             prices_df=prices_df,
             metadata=metadata,
-            config=config
+            config=config,
+            start_date=start_date,
+            volumes_df=volumes_df
         )
         
         # Save results
-        save_spread_data('CL', spread_data, config)
+        save_spread_data('CL', spread_data, config, metadata=metadata,
+                         append=start_date is not None)
         print("Calculations complete and saved")
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 @dataclass
@@ -7,8 +7,9 @@ class SpreadsConfig:
     # Calculation parameters
     TRADING_DAYS_PER_YEAR: int = 251
     MAX_MONTHS_FORWARD: int = 13
-    MIN_DAYS_TO_EXPIRY: int = 0
-    MIN_VOLUME: float = 0
+    MIN_DAYS_TO_EXPIRY: int = 0  # Skip contracts closer to expiry than this
+    MIN_VOLUME: float = 0  # Skip contracts trading less on average, 0 disables
+    VOLUME_WINDOW: int = 1  # Trading days averaged for MIN_VOLUME
     
     # Path settings
     BASE_PATH: str = None
@@ -17,6 +18,43 @@ class SpreadsConfig:
     CALCULATE_DOLLAR_SPREADS: bool = True
     CALCULATE_PERCENT_SPREADS: bool = True
     CALCULATE_ANNUAL_SPREADS: bool = True
+    CALCULATE_SPREAD_MATRIX: bool = False  # Spreads of every month pair (spread_matrix.py)
+    
+    # Constant-maturity curve: prices interpolated at these days to expiry
+    CONSTANT_MATURITY_TENORS: List[int] = field(default_factory=lambda: [30, 60, 90, 180, 365])
+    
+    # Inter-market spreads (inter_market.py): leg weights per commodity,
+    # prices converted to 'units'; kind 'ratio' multiplies prices raised
+    # to their weights instead of summing them
+    INTER_MARKET_SPREADS: Dict[str, Dict] = field(default_factory=lambda: {
+        'brent_wti': {'legs': {'CO': 1.0, 'CL': -1.0}, 'units': 'USD/bbl'},
+        'crack_321': {'legs': {'XB': 2.0, 'HO': 1.0, 'CL': -3.0}, 'units': 'USD/bbl',
+                      'divisor': 3.0},
+        'gold_silver': {'legs': {'GC': 1.0, 'SI': -1.0}, 'units': 'USD/t oz',
+                        'kind': 'ratio'}
+    })
+    
+    # Roll calendar (roll_calendar.py)
+    ROLL_RULE: str = 'expiry'  # 'expiry', 'business_days' or 'volume'
+    ROLL_BUSINESS_DAYS: int = 5  # Days before the last trade date for 'business_days'
+    
+    # Storage types
+    FLOAT32_OUTPUTS: bool = False  # Store prices and spreads as float32
+    
+    # Seasonality (seasonality.py): delivery-month spreads as near-far month codes
+    SEASONAL_SPREADS: List[str] = field(default_factory=lambda: ['Z-H', 'H-J', 'V-F', 'Q-Z'])
+    SEASONAL_PERCENTILES: List[int] = field(default_factory=lambda: [10, 25, 50, 75, 90])
+    
+    # Rolling statistics (rolling_stats.py): windows in trading days, a value
+    # needs half its window observed
+    ROLLING_WINDOWS: List[int] = field(default_factory=lambda: [20, 60, 250])
+    
+    # Visualization
+    VISUALIZATION_WORKERS: int = 4  # Processes rendering PDFs
+    
+    # Update settings
+    INCREMENTAL: bool = True  # Only recompute dates after the last calculation
+    INCREMENTAL_OVERLAP_DAYS: int = 5
     
     def __post_init__(self):
         if self.BASE_PATH is None:
@@ -0,0 +1,137 @@
+# spreads_pyramid.py
+
+import pandas as pd
+import os
+import json
+from typing import Dict, Optional
+from fetch_config import FetchConfig
+from spreads_config import SpreadsConfig
+
+# Downsampled resolutions of the daily spread series, stored per commodity as
+#   processed_data/<COMMODITY>/pyramid/<TYPE>_<LEVEL>.parquet
+# Every bucket keeps min, max and last of each spread so spikes survive.
+PYRAMID_LEVELS = {
+    'weekly': 'W-FRI',
+    'monthly': 'ME'
+}
+AGGREGATIONS = ['min', 'max', 'last']
+
+PYRAMID_SPREAD_FILES = {
+    'dollar': 'spreads_dollar.parquet',
+    'percent': 'spreads_percent.parquet',
+    'annual': 'spreads_annual.parquet',
+    'constant_maturity': 'constant_maturity.parquet'
+}
+
+def downsample(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Min, max and last value of every column per bucket, labelled by bucket end"""
+    buckets = df.resample(rule).agg(AGGREGATIONS)
+    buckets.columns = [f"{column}_{stat}" for column, stat in buckets.columns]
+    return buckets.dropna(how='all')
+
+def bucket_label(date: pd.Timestamp, rule: str) -> pd.Timestamp:
+    """Label of the bucket that contains date"""
+    return pd.date_range(pd.Timestamp(date).normalize(), periods=1, freq=rule)[0]
+
+def get_pyramid_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.PROCESSED_DATA_PATH, commodity, 'pyramid')
+
+def get_source_key(commodity: str, config: SpreadsConfig) -> Optional[Dict]:
+    """
+    Settings, output types and last full write of the spread calculation
+    a derived store was built from. A different key means the spread
+    history may have changed and the store must be rebuilt.
+    """
+    info_path = os.path.join(config.PROCESSED_DATA_PATH, commodity, 'spread_info.json')
+    if not os.path.exists(info_path):
+        return None
+    with open(info_path, 'r') as f:
+        info = json.load(f)
+    return {
+        'start': info['date_range']['start'],
+        'max_months_forward': info.get('max_months_forward'),
+        'trading_days_per_year': info.get('trading_days_per_year'),
+        'liquidity': info.get('liquidity'),
+        'constant_maturity_tenors': info.get('constant_maturity_tenors'),
+        'metadata_hash': info.get('metadata_hash'),
+        'float32_outputs': info.get('float32_outputs', False),
+        'full_write': info.get('full_write')
+    }
+
+def load_pyramid_level(commodity: str, spread_type: str, level: str,
+                       config: SpreadsConfig) -> Optional[pd.DataFrame]:
+    """Load one downsampled level, None if it has not been built"""
+    level_path = os.path.join(get_pyramid_path(commodity, config), f'{spread_type}_{level}.parquet')
+    if not os.path.exists(level_path):
+        return None
+    return pd.read_parquet(level_path)
+
+def update_pyramid(commodity: str, config: SpreadsConfig,
+                   spread_files: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """
+    Build or extend the downsampled levels of a commodity's spreads, or of
+    the given spread type -> file mapping.
+    Only buckets from the one holding the last INCREMENTAL_OVERLAP_DAYS of
+    the previous build are recomputed, unless the spreads were rebuilt from
+    different settings. Returns the number of recomputed buckets per file.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    pyramid_path = get_pyramid_path(commodity, config)
+    info_path = os.path.join(pyramid_path, 'pyramid_info.json')
+    os.makedirs(pyramid_path, exist_ok=True)
+
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+    source = get_source_key(commodity, config)
+    incremental = source is not None and info.get('source') == source and 'end' in info
+
+    updated = {}
+    end = None
+    for spread_type, filename in (spread_files or PYRAMID_SPREAD_FILES).items():
+        source_path = os.path.join(spread_path, filename)
+        if not os.path.exists(source_path):
+            continue
+        df = pd.read_parquet(source_path)
+        end = df.index.max()
+
+        for level, rule in PYRAMID_LEVELS.items():
+            level_path = os.path.join(pyramid_path, f'{spread_type}_{level}.parquet')
+            kept = None
+            if incremental and os.path.exists(level_path):
+                changed_from = pd.Timestamp(info['end']) - pd.Timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)
+                existing = pd.read_parquet(level_path)
+                kept = existing[existing.index < bucket_label(changed_from, rule)]
+
+            if kept is not None and len(kept):
+                buckets = downsample(df[df.index > kept.index.max()], rule)
+                levels_df = pd.concat([kept, buckets])
+            else:
+                buckets = downsample(df, rule)
+                levels_df = buckets
+
+            levels_df.to_parquet(level_path)
+            updated[f'{spread_type}_{level}'] = len(buckets)
+
+    if end is not None:
+        with open(info_path, 'w') as f:
+            json.dump({'source': source, 'end': end.isoformat(),
+                       'levels': list(PYRAMID_LEVELS)}, f, indent=2)
+        print(f"Updated {commodity} pyramid: {sum(updated.values())} buckets recomputed")
+    return updated
+
+def main():
+    """Build the downsampled levels of all commodities"""
+    base_path = os.getcwd()
+    fetch_config = FetchConfig(BASE_PATH=base_path)
+    config = SpreadsConfig(BASE_PATH=base_path)
+
+    for commodity in fetch_config.COMMODITIES:
+        if os.path.exists(os.path.join(config.PROCESSED_DATA_PATH, commodity, 'spread_info.json')):
+            update_pyramid(commodity, config)
+        else:
+            print(f"No spread data found for {commodity}")
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,30 @@
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Render to files only, no display needed
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Optional
 from fetch_config import FetchConfig
 from spreads_config import SpreadsConfig
+from contract_index import ContractIndex, load_contract_index
+from roll_calendar import load_roll_table, get_roll_table_path
 from datetime import datetime
 
+# Page size in inches and the buckets per inch each series is decimated to
+PAGE_SIZE = (15, 8)
+PLOT_DPI = 100
+
+# Processed files a PDF is drawn from
+VISUALIZED_FILES = ['monthly_futures.parquet', 'spreads_dollar.parquet',
+                    'spreads_percent.parquet', 'spreads_annual.parquet']
+
 def load_spread_data(commodity: str, config: SpreadsConfig) -> Dict[str, pd.DataFrame]:
     """Load all spread data for a commodity"""
     spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
@@ -29,32 +45,100 @@ def load_spread_data(commodity: str, config: SpreadsConfig) -> Dict[str, pd.Data
         print(f"Error loading spread data for {commodity}: {e}")
         return None
 
-def identify_roll_dates(monthly_futures_df: pd.DataFrame) -> List[datetime]:
+def identify_roll_dates(monthly_futures_df: pd.DataFrame,
+                        contract_index: Optional[ContractIndex] = None) -> List[datetime]:
     """Identify dates when the front month future changes"""
-    roll_dates = []
-    previous_front = None
-    front_month_col = 'month_1_future'
+    if contract_index is not None and len(contract_index):
+        roll_dates = contract_index.roll_dates(monthly_futures_df.index)
+        print(f"Identified {len(roll_dates)} roll dates")
+        return roll_dates
     
+    front_month_col = 'month_1_future'
     if front_month_col not in monthly_futures_df.columns:
-        return roll_dates
-        
-    for date in monthly_futures_df.index:
-        current_front = monthly_futures_df.loc[date, front_month_col]
-        if pd.notna(current_front) and current_front != previous_front:
-            roll_dates.append(date)
-            previous_front = current_front
+        return []
+    
+    # Dates where the front contract differs from the previous quoted one
+    front = monthly_futures_df[front_month_col].dropna().astype(str).to_numpy()
+    quoted = monthly_futures_df[front_month_col].dropna().index
+    roll_dates = list(quoted[1:][front[1:] != front[:-1]])
     
     print(f"Identified {len(roll_dates)} roll dates")
     return roll_dates
 
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Min/max decimation of several series: the rows of the lowest and
+    highest value of each column in every bucket, in time order. Keeps
+    every spike at the output resolution. Returns an (points, columns)
+    array of row indices; buckets without values select a NaN row, so
+    gaps in the data stay gaps.
+    """
+    n, k = y.shape
+    if n <= 2 * n_buckets:
+        return np.tile(np.arange(n)[:, None], (1, k))
+    
+    # Equal sized buckets, the last one padded with NaN
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full((n_buckets * size, k), np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size, k)
+    
+    missing = np.isnan(buckets)
+    lows = np.where(missing, np.inf, buckets).argmin(axis=1)
+    highs = np.where(missing, -np.inf, buckets).argmax(axis=1)
+    
+    starts = (np.arange(n_buckets) * size)[:, None]
+    first = starts + np.minimum(lows, highs)
+    second = starts + np.maximum(lows, highs)
+    selected = np.stack([first, second], axis=1).reshape(2 * n_buckets, k)
+    return np.minimum(selected, n - 1)
+
+def plot_spread_page(pdf: PdfPages, spreads_df: pd.DataFrame, roll_dates: List[datetime],
+                     title: str, ylabel: str, percent: bool = False):
+    """Plot one spread type downsampled to the page resolution, with roll markers"""
+    fig, ax = plt.subplots(figsize=PAGE_SIZE)
+    
+    # Points selected per column at the page resolution
+    y = spreads_df.to_numpy(dtype=np.float64)
+    selected = minmax_indices(y, int(PAGE_SIZE[0] * PLOT_DPI))
+    
+    for j, column in enumerate(spreads_df.columns):
+        rows = selected[:, j]
+        ax.plot(spreads_df.index[rows], y[rows, j], label=column, linewidth=1.5)
+    
+    # All roll markers as one path of NaN-separated segments spanning the axes height
+    if roll_dates:
+        marker_x = np.repeat(pd.DatetimeIndex(roll_dates).values, 3)
+        marker_x[2::3] = np.datetime64('NaT')
+        marker_y = np.tile([0.0, 1.0, np.nan], len(roll_dates))
+        ax.plot(marker_x, marker_y, transform=ax.get_xaxis_transform(),
+                color='gray', linewidth=0.5, alpha=0.7)
+    
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    if percent:
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: '{:.1%}'.format(y)))
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.grid(True, axis='y')
+    fig.tight_layout()
+    pdf.savefig(fig)
+    plt.close(fig)
+
 def create_spread_visualizations(spreads_data: Dict[str, pd.DataFrame], 
                                commodity: str, 
                                config: SpreadsConfig):
     """Create visualizations for all types of spreads in a single PDF"""
     print(f"\nCreating visualizations for {commodity}...")
     
-    # Identify roll dates
-    roll_dates = identify_roll_dates(spreads_data['monthly_futures'])
+    # Roll dates from the stored roll table, else from contract expiries
+    roll_table = load_roll_table(commodity, config)
+    if roll_table is not None:
+        roll_dates = list(roll_table['date'])
+    else:
+        contract_index = load_contract_index(commodity, config.RAW_DATA_PATH)
+        roll_dates = identify_roll_dates(spreads_data['monthly_futures'], contract_index)
     print(f"Plotting with {len(roll_dates)} roll dates")
     
     # Setup the PDF
@@ -63,67 +147,89 @@ def create_spread_visualizations(spreads_data: Dict[str, pd.DataFrame],
     pdf_path = os.path.join(viz_path, f'{commodity}_spreads.pdf')
     
     with PdfPages(pdf_path) as pdf:
-        # Dollar spreads
-        plt.figure(figsize=(15, 8))
-        for column in spreads_data['spreads_dollar'].columns:
-            plt.plot(spreads_data['spreads_dollar'].index, 
-                    spreads_data['spreads_dollar'][column], 
-                    label=column, linewidth=1.5)
-        
-        # Add roll date lines
-        for roll_date in roll_dates:
-            plt.axvline(x=roll_date, color='gray', linewidth=0.5, alpha=0.7)
-        
-        plt.title(f'{commodity} Dollar Spreads')
-        plt.xlabel('Date')
-        plt.ylabel('Spread Value')
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, axis='y')
-        plt.tight_layout()
-        pdf.savefig()
-        plt.close()
-        
-        # Percentage spreads
-        plt.figure(figsize=(15, 8))
-        for column in spreads_data['spreads_percent'].columns:
-            plt.plot(spreads_data['spreads_percent'].index, 
-                    spreads_data['spreads_percent'][column], 
-                    label=column, linewidth=1.5)
-        
-        for roll_date in roll_dates:
-            plt.axvline(x=roll_date, color='gray', linewidth=0.5, alpha=0.7)
+        plot_spread_page(pdf, spreads_data['spreads_dollar'], roll_dates,
+                         f'{commodity} Dollar Spreads', 'Spread Value')
+        plot_spread_page(pdf, spreads_data['spreads_percent'], roll_dates,
+                         f'{commodity} Percentage Spreads', 'Spread Percentage',
+                         percent=True)
+        plot_spread_page(pdf, spreads_data['spreads_annual'], roll_dates,
+                         f'{commodity} Annualized Percentage Spreads',
+                         'Annualized Spread Percentage', percent=True)
+    
+    print(f"Visualizations saved to {pdf_path}")
+
+def get_data_fingerprint(commodity: str, config: SpreadsConfig) -> Optional[str]:
+    """
+    Hash of everything a commodity's PDF is drawn from: the spread files,
+    the calculation settings in spread_info.json, the roll table and
+    contract metadata used for roll dates, and the page layout. None
+    without processed data.
+    """
+    spread_path = os.path.join(config.PROCESSED_DATA_PATH, commodity)
+    info_path = os.path.join(spread_path, 'spread_info.json')
+    if not os.path.exists(info_path):
+        return None
+    
+    with open(info_path, 'r') as f:
+        info = json.load(f)
+    info.pop('last_calculation', None)
+    h = hashlib.sha256(json.dumps(info, sort_keys=True).encode())
+    h.update(repr((PAGE_SIZE, PLOT_DPI)).encode())
+    
+    paths = [os.path.join(spread_path, filename) for filename in VISUALIZED_FILES]
+    paths.append(os.path.join(config.RAW_DATA_PATH, commodity, 'metadata.json'))
+    paths.append(get_roll_table_path(commodity, config))
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+def get_fingerprint_path(commodity: str, config: SpreadsConfig) -> str:
+    return os.path.join(config.BASE_PATH, 'visualizations', f'{commodity}_spreads.json')
+
+def render_commodity(commodity: str, config: SpreadsConfig, force: bool = False) -> Dict:
+    """
+    Render one commodity's PDF unless the fingerprint stored next to it
+    matches the processed data. Returns status and seconds taken.
+    """
+    start = time.perf_counter()
+    try:
+        fingerprint = get_data_fingerprint(commodity, config)
+        if fingerprint is None:
+            print(f"Skipping {commodity} - no data available")
+            return {'status': 'no data', 'seconds': time.perf_counter() - start}
         
-        plt.title(f'{commodity} Percentage Spreads')
-        plt.xlabel('Date')
-        plt.ylabel('Spread Percentage')
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: '{:.1%}'.format(y)))
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, axis='y')
-        plt.tight_layout()
-        pdf.savefig()
-        plt.close()
+        fingerprint_path = get_fingerprint_path(commodity, config)
+        pdf_path = os.path.join(config.BASE_PATH, 'visualizations', f'{commodity}_spreads.pdf')
+        if not force and os.path.exists(pdf_path) and os.path.exists(fingerprint_path):
+            with open(fingerprint_path, 'r') as f:
+                if json.load(f).get('fingerprint') == fingerprint:
+                    print(f"Skipping {commodity} - visualizations up to date")
+                    return {'status': 'skipped', 'seconds': time.perf_counter() - start}
         
-        # Annualized percentage spreads
-        plt.figure(figsize=(15, 8))
-        for column in spreads_data['spreads_annual'].columns:
-            plt.plot(spreads_data['spreads_annual'].index, 
-                    spreads_data['spreads_annual'][column], 
-                    label=column, linewidth=1.5)
+        print(f"\nProcessing visualizations for {commodity}")
+        spread_data = load_spread_data(commodity, config)
+        if not spread_data:
+            return {'status': 'failed', 'error': 'Could not load spread data',
+                    'seconds': time.perf_counter() - start}
+        create_spread_visualizations(spread_data, commodity, config)
         
-        for roll_date in roll_dates:
-            plt.axvline(x=roll_date, color='gray', linewidth=0.5, alpha=0.7)
+        with open(fingerprint_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint,
+                       'rendered': datetime.now().isoformat()}, f, indent=2)
+        return {'status': 'rendered', 'seconds': time.perf_counter() - start}
         
-        plt.title(f'{commodity} Annualized Percentage Spreads')
-        plt.xlabel('Date')
-        plt.ylabel('Annualized Spread Percentage')
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: '{:.1%}'.format(y)))
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, axis='y')
-        plt.tight_layout()
-        pdf.savefig()
-        plt.close()
-    
-    print(f"Visualizations saved to {pdf_path}")
+    except Exception as e:
+        print(f"Error rendering {commodity}: {e}")
+        return {'status': 'failed', 'error': str(e), 'seconds': time.perf_counter() - start}
+
+def render_all(commodities: List[str], config: SpreadsConfig, force: bool = False) -> Dict[str, Dict]:
+    """Render commodities in a process pool of VISUALIZATION_WORKERS"""
+    with ProcessPoolExecutor(max_workers=config.VISUALIZATION_WORKERS) as pool:
+        futures = {commodity: pool.submit(render_commodity, commodity, config, force)
+                   for commodity in commodities}
+        return {commodity: future.result() for commodity, future in futures.items()}
 
 def main():
     """Create visualizations for all commodities"""
@@ -132,17 +238,20 @@ def main():
     config = SpreadsConfig(BASE_PATH=base_path)
     fetch_config = FetchConfig(BASE_PATH=base_path)
     
-    for commodity in fetch_config.COMMODITIES:
-        print(f"\nProcessing visualizations for {commodity}")
-        
-        # Load spread data
-        spread_data = load_spread_data(commodity, config)
-        
-        if spread_data:
-            # Create visualizations
-            create_spread_visualizations(spread_data, commodity, config)
-        else:
-            print(f"Skipping {commodity} - no data available")
+    start = time.perf_counter()
+    results = render_all(fetch_config.COMMODITIES, config)
+    
+    print("\nVisualization Summary")
+    print("=" * 50)
+    print(f"{'Commodity':<10} {'Status':<10} {'Seconds':>8}")
+    print("-" * 50)
+    for commodity, result in results.items():
+        print(f"{commodity:<10} {result['status']:<10} {result['seconds']:>8.2f} {result.get('error', '')}")
+    
+    statuses = [result['status'] for result in results.values()]
+    print(f"\nRendered: {statuses.count('rendered')}, skipped: {statuses.count('skipped')}, "
+          f"failed: {statuses.count('failed')}")
+    print(f"Total time: {time.perf_counter() - start:.2f}s")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
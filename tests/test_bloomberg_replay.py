@@ -0,0 +1,36 @@
+# test_bloomberg_replay.py
+
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from fetch_config import FetchConfig
+from bloomberg_replay import Recording, ReplaySession
+from data_fetcher import fetch_metadata, fetch_price_volume_data
+
+def test_replayed_fetch_matches_recording(tmp_path):
+    """Fetch through a replay, concurrent and fragmented, without the Bloomberg SDK"""
+    config = FetchConfig(BASE_PATH=str(tmp_path), BATCH_SIZE=2, MAX_IN_FLIGHT_REQUESTS=3)
+    tickers = ['CLF20 Comdty', 'CLG20 Comdty', 'CLH20 Comdty', 'CLJ20 Comdty', 'CLK20 Comdty']
+    dates = pd.bdate_range('2019-11-01', '2019-12-31').date
+
+    recording = Recording()
+    expected = {}
+    for i, ticker in enumerate(tickers):
+        recording.reference[ticker] = {'name': ticker, 'QUOTE_UNITS': 'USD/bbl.',
+                                       'LAST_TRADEABLE_DT': date(2020, 1 + i, 20).isoformat()}
+        prices = 55.0 + i + np.arange(len(dates)) / 10
+        recording.historical[ticker] = {d: {'PX_LAST': p, 'PX_VOLUME': 1000.0 * (i + 1)}
+                                        for d, p in zip(dates, prices)}
+        expected[ticker] = prices
+
+    session = ReplaySession(recording, fragment_size=1)
+    metadata = fetch_metadata(session, tickers, config)
+    prices_df, volumes_df = fetch_price_volume_data(
+        session, tickers, datetime(2019, 11, 1), datetime(2019, 12, 31), config)
+
+    assert {t: m['last_trade_date'] for t, m in metadata.items()} == {
+        t: recording.reference[t]['LAST_TRADEABLE_DT'] for t in tickers}
+    assert session.requests_sent == 6
+    for ticker in tickers:
+        np.testing.assert_array_equal(prices_df[ticker].to_numpy(), expected[ticker])
+    assert (volumes_df['CLK20 Comdty'] == 5000.0).all()
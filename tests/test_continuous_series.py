@@ -0,0 +1,78 @@
+# test_continuous_series.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from contract_index import ContractIndex
+from spreads_config import SpreadsConfig
+from spreads_calculator import create_monthly_futures_data
+from roll_calendar import build_roll_table
+from continuous_series import build_continuous
+
+@pytest.fixture
+def curve_data():
+    """A year of business days over monthly contracts in contango"""
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range('2020-01-01', '2020-12-31')
+    expiries = pd.date_range('2020-01-20', periods=18, freq='MS') + pd.Timedelta(days=19)
+    metadata = {f'CL{i:02d} Comdty': {'last_trade_date': expiry.strftime('%Y-%m-%d')}
+                for i, expiry in enumerate(expiries)}
+
+    spot = 50 + np.cumsum(rng.normal(0, 0.5, len(dates)))
+    prices = spot[:, None] + 0.4 * np.arange(len(metadata))[None, :]
+    return pd.DataFrame(prices, index=dates, columns=list(metadata)), metadata
+
+def build(prices_df, metadata, rule='expiry', business_days=0):
+    config = SpreadsConfig(BASE_PATH='.', MAX_MONTHS_FORWARD=4)
+    monthly_futures = create_monthly_futures_data(prices_df, metadata, config)[0]
+    contract_index = ContractIndex.from_metadata(metadata)
+    roll_table = build_roll_table(monthly_futures.index, contract_index, rule, business_days)
+    built = build_continuous(monthly_futures, prices_df, contract_index, roll_table)
+    return dict(built, roll_table=roll_table)
+
+def test_one_day_gap_leaves_adjusted_series_unchanged(curve_data):
+    prices_df, metadata = curve_data
+    expected = build(prices_df, metadata)
+
+    # Front contract missing mid-month: the slots shift down for that day only
+    gap_date = pd.Timestamp('2020-03-10')
+    front = ContractIndex.from_metadata(metadata).front_contracts([gap_date])[0]
+    gapped = prices_df.copy()
+    gapped.loc[gap_date, front] = np.nan
+    result = build(gapped, metadata)
+
+    pd.testing.assert_frame_equal(result['adjustments'], expected['adjustments'])
+    series = result['series']
+    assert series.loc[gap_date, ['month_1_difference', 'month_1_ratio']].isna().all()
+    pd.testing.assert_frame_equal(series.drop(index=gap_date),
+                                  expected['series'].drop(index=gap_date))
+    pd.testing.assert_frame_equal(series.drop(columns=['month_1_difference', 'month_1_ratio']),
+                                  expected['series'].drop(columns=['month_1_difference', 'month_1_ratio']))
+
+def test_rolls_follow_expiries(curve_data):
+    prices_df, metadata = curve_data
+    built = build(prices_df, metadata)
+
+    # One roll per slot for each expiry inside the year, each removing the 0.4 contango
+    adjustments = built['adjustments']
+    assert (adjustments.groupby('slot').size() == 11).all()
+    np.testing.assert_allclose(adjustments['gap'], 0.4)
+    difference = built['series']['month_1_difference'].to_numpy()
+    np.testing.assert_allclose(np.diff(difference), np.diff(prices_df.iloc[:, 0].to_numpy()))
+
+def test_rolls_follow_roll_table(curve_data):
+    prices_df, metadata = curve_data
+    built = build(prices_df, metadata, rule='business_days', business_days=5)
+
+    # Every slot rolls on the roll table's dates, slot 1 into its contracts
+    roll_table = built['roll_table']
+    adjustments = built['adjustments']
+    index = built['series'].index
+    for slot, rolls in adjustments.groupby('slot'):
+        assert list(index[rolls['row']]) == list(roll_table['date'])
+    front = adjustments[adjustments['slot'] == 'month_1']
+    contracts = ContractIndex.from_metadata(metadata).contracts
+    assert [contracts[p] for p in front['to_position']] == list(roll_table['to_contract'])
+    # Five business days ahead of the expiry schedule
+    expiries = pd.to_datetime([metadata[c]['last_trade_date'] for c in roll_table['from_contract']])
+    assert (roll_table['date'] < expiries).all()
@@ -0,0 +1,50 @@
+# test_data_fetcher.py
+
+from datetime import datetime, timedelta
+import pytest
+from fetch_config import FetchConfig
+from data_fetcher import get_tickers_to_probe, mark_probed_tickers, prune_expired_tickers
+
+@pytest.fixture
+def config(tmp_path):
+    return FetchConfig(BASE_PATH=str(tmp_path), EXPIRY_REPROBE_DAYS=30)
+
+def probed(days_ago: int) -> str:
+    return (datetime.now() - timedelta(days=days_ago)).isoformat()
+
+def test_probe_unknown_and_stale_expiries(config):
+    metadata = {
+        'CLF0 Comdty': {'name': 'CLF0', 'units': '', 'last_trade_date': '2019-12-19'},
+        'CLG0 Comdty': {'name': 'CLG0', 'units': '', 'last_trade_date': '', 'expiry_probed': probed(5)},
+        'CLH0 Comdty': {'name': 'CLH0', 'units': '', 'last_trade_date': '', 'expiry_probed': probed(45)},
+        'CLJ0 Comdty': {'name': 'CLJ0', 'units': '', 'last_trade_date': ''},
+        'CLK0 Comdty': 'malformed'
+    }
+    tickers = list(metadata) + ['CLM0 Comdty']
+
+    # Known expiries and recent probes are skipped, everything else is probed
+    assert get_tickers_to_probe(tickers, metadata, config) == [
+        'CLH0 Comdty', 'CLJ0 Comdty', 'CLK0 Comdty', 'CLM0 Comdty']
+
+    mark_probed_tickers(['CLH0 Comdty', 'CLK0 Comdty', 'CLM0 Comdty'], metadata)
+    assert metadata['CLK0 Comdty']['last_trade_date'] == ''
+    assert get_tickers_to_probe(tickers, metadata, config) == ['CLJ0 Comdty']
+
+def test_mark_probed_keeps_known_expiries():
+    metadata = {'CLF0 Comdty': {'name': 'CLF0', 'units': '', 'last_trade_date': '2019-12-19'}}
+    mark_probed_tickers(['CLF0 Comdty'], metadata)
+    assert 'expiry_probed' not in metadata['CLF0 Comdty']
+
+def test_prune_keeps_live_contracts():
+    metadata = {
+        'CLF0 Comdty': {'last_trade_date': '2019-12-19'},
+        'CLG0 Comdty': {'last_trade_date': '2020-01-21'},
+        'CLH0 Comdty': {'last_trade_date': '2020-02-20'},
+        'CLJ0 Comdty': {'last_trade_date': ''},
+        'CLK0 Comdty': 'malformed'
+    }
+    tickers = ['CLH0 Comdty', 'CLF0 Comdty', 'CLG0 Comdty', 'CLJ0 Comdty', 'CLK0 Comdty']
+
+    # Contracts expiring on the start date are still fetched
+    pruned = prune_expired_tickers(tickers, metadata, datetime(2020, 1, 21))
+    assert pruned == ['CLH0 Comdty', 'CLG0 Comdty']
@@ -0,0 +1,35 @@
+# test_inter_market.py
+
+import json
+import pytest
+from inter_market import parse_units, conversion_factor, get_quote_units
+
+def test_parse_units():
+    assert parse_units('USD/bbl.') == (1.0, 'volume', 42.0)
+    assert parse_units('USd/gal.') == (0.01, 'volume', 1.0)
+    assert parse_units('USD/t oz.') == (1.0, 'mass', 1.0)
+    with pytest.raises(ValueError):
+        parse_units('EUR/mt')
+    with pytest.raises(ValueError):
+        parse_units('USD/contract')
+
+def test_conversion_factor():
+    # Heating oil in cents per gallon against crude in dollars per barrel
+    assert conversion_factor('USd/gal.', 'USD/bbl.') == pytest.approx(0.42)
+    assert conversion_factor('USD/bbl.', 'USd/gal.') == pytest.approx(1 / 0.42)
+    # Grain in cents per bushel, 42 gallons to the barrel and about 9.31 to the bushel
+    assert conversion_factor('USd/bu.', 'USD/bbl.') == pytest.approx(0.01 * 42 / 9.30917696)
+    assert conversion_factor('USD/bbl.', 'USD/bbl.') == 1.0
+    with pytest.raises(ValueError):
+        conversion_factor('USD/t oz.', 'USD/bbl.')
+
+def test_quote_units_skip_malformed_metadata(tmp_path):
+    (tmp_path / 'HO').mkdir()
+    metadata = {
+        'HOF0 Comdty': {'name': 'HOF0', 'units': 'USd/gal.', 'last_trade_date': '2019-12-31'},
+        'HOG0 Comdty': {'name': 'HOG0', 'units': '', 'last_trade_date': '2020-01-31'},
+        'HOH0 Comdty': 'malformed'
+    }
+    (tmp_path / 'HO' / 'metadata.json').write_text(json.dumps(metadata))
+    assert get_quote_units('HO', str(tmp_path)) == 'USd/gal.'
+    assert get_quote_units('CL', str(tmp_path)) is None
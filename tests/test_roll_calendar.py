@@ -0,0 +1,66 @@
+# test_roll_calendar.py
+
+import json
+import os
+import pandas as pd
+import pytest
+from contract_index import ContractIndex
+from spreads_config import SpreadsConfig
+from roll_calendar import build_roll_table, update_roll_table
+
+@pytest.fixture
+def contract_index():
+    """Monthly contracts, two of them expiring on the same day"""
+    expiries = {f'CL{code}0 Comdty': expiry
+                for code, expiry in zip('FGHJKM', pd.date_range('2020-01-21', periods=6, freq='MS')
+                                        + pd.Timedelta(days=20))}
+    expiries['CLX9 Comdty'] = expiries['CLH0 Comdty']
+    return ContractIndex.from_last_trade_dates(expiries)
+
+def test_expiry_table_matches_roll_dates(contract_index):
+    # From before the first expiry to after the last one
+    dates = pd.bdate_range('2020-01-02', '2020-08-31')
+    table = build_roll_table(dates, contract_index, 'expiry')
+
+    assert list(table['date']) == contract_index.roll_dates(dates)
+    assert dates[0] not in list(table['date'])
+    assert len(table) == 5
+
+def test_expiry_table_continues_from_held_contract(contract_index):
+    dates = pd.bdate_range('2020-01-02', '2020-08-31')
+    full = build_roll_table(dates, contract_index, 'expiry')
+
+    split = dates[60]
+    head = build_roll_table(dates[dates < split], contract_index, 'expiry')
+    held = contract_index.first_unexpired(dates[dates < split])[-1]
+    tail = build_roll_table(dates[dates >= split], contract_index, 'expiry', held_before=held)
+    pd.testing.assert_frame_equal(pd.concat([head, tail], ignore_index=True), full)
+
+@pytest.fixture
+def stored_dates(tmp_path, contract_index):
+    """Raw metadata and processed dates of CL under tmp_path"""
+    config = SpreadsConfig(BASE_PATH=str(tmp_path))
+    raw_path = os.path.join(config.RAW_DATA_PATH, 'CL')
+    processed_path = os.path.join(config.PROCESSED_DATA_PATH, 'CL')
+    os.makedirs(raw_path)
+    os.makedirs(processed_path)
+
+    metadata = {contract: {'name': contract, 'units': 'USD/bbl.', 'last_trade_date': str(expiry.date())}
+                for contract, expiry in contract_index.last_trade_dates().items()}
+    with open(os.path.join(raw_path, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f)
+    dates = pd.bdate_range('2020-01-02', '2020-08-31')
+    pd.DataFrame(index=dates).to_parquet(os.path.join(processed_path, 'monthly_futures.parquet'))
+    return config, dates
+
+@pytest.mark.parametrize('rule', ['expiry', 'business_days'])
+@pytest.mark.parametrize('roll', [0, 2])
+def test_update_starting_on_roll_date(stored_dates, rule, roll):
+    config, dates = stored_dates
+    config.ROLL_RULE = rule
+    full = update_roll_table('CL', config.RAW_DATA_PATH, config)
+
+    # Recompute from a roll date, with and without earlier rolls kept
+    start_date = full['date'].iloc[roll]
+    incremental = update_roll_table('CL', config.RAW_DATA_PATH, config, start_date=start_date)
+    pd.testing.assert_frame_equal(incremental, full)
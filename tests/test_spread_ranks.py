@@ -0,0 +1,17 @@
+# test_spread_ranks.py
+
+import numpy as np
+from spread_ranks import remove_sorted, insert_sorted
+
+def test_remove_sorted_drops_one_occurrence_each():
+    values = np.array([1.0, 2.0, 2.0, 2.0, 3.5, 7.0])
+    result = remove_sorted(values, np.array([2.0, np.nan, 7.0, 2.0]))
+    np.testing.assert_array_equal(result, [1.0, 2.0, 3.5])
+    np.testing.assert_array_equal(insert_sorted(result, np.array([2.0, 7.0, 2.0])), values)
+
+def test_remove_sorted_rejects_values_not_stored():
+    values = np.array([1.0, 2.0, 3.5, 7.0])
+    # A neighbour of the missing value must not be deleted in its place
+    assert remove_sorted(values, np.array([2.5])) is None
+    assert remove_sorted(values, np.array([8.0])) is None
+    assert remove_sorted(values, np.array([2.0, 2.0])) is None
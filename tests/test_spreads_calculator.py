@@ -0,0 +1,111 @@
+# test_spreads_calculator.py
+
+import pandas as pd
+import numpy as np
+import pytest
+from datetime import datetime
+from typing import Dict, Tuple
+from spreads_config import SpreadsConfig
+from spreads_calculator import create_monthly_futures_data
+
+def loop_monthly_futures_data(prices_df: pd.DataFrame, metadata: Dict,
+                              config: SpreadsConfig) -> Tuple[pd.DataFrame, ...]:
+    """Original date-by-date term structure, kept as the reference output"""
+    last_trade_dates = {}
+    for contract, info in metadata.items():
+        try:
+            last_trade_dates[contract] = pd.to_datetime(info['last_trade_date'])
+        except:
+            continue
+
+    monthly_futures = pd.DataFrame(index=prices_df.index)
+    spreads_dollar = pd.DataFrame(index=prices_df.index)
+    spreads_percent = pd.DataFrame(index=prices_df.index)
+    spreads_percent_annual = pd.DataFrame(index=prices_df.index)
+    days_to_expiry_df = pd.DataFrame(index=prices_df.index)
+
+    for date in prices_df.index:
+        valid_contracts = [c for c in prices_df.columns if pd.notna(prices_df.at[date, c])]
+        days_to_expiry = {contract: (last_trade_date - date).days
+                          for contract, last_trade_date in last_trade_dates.items()
+                          if pd.notna(last_trade_date) and last_trade_date >= date}
+        ordered_contracts = sorted([(c, days_to_expiry[c]) for c in valid_contracts
+                                    if c in days_to_expiry], key=lambda x: x[1])
+        if not ordered_contracts:
+            continue
+
+        for i, (contract, days) in enumerate(ordered_contracts, 1):
+            if i > config.MAX_MONTHS_FORWARD:
+                break
+            monthly_futures.at[date, f"month_{i}_future"] = contract
+            monthly_futures.at[date, f"month_{i}_price"] = prices_df.at[date, contract]
+            days_to_expiry_df.at[date, f"month_{i}_days"] = days
+
+        if len(ordered_contracts) >= 2:
+            m1_contract, m1_days = ordered_contracts[0]
+            m1_price = prices_df.at[date, m1_contract]
+            for i in range(1, min(len(ordered_contracts), config.MAX_MONTHS_FORWARD)):
+                far_contract, far_days = ordered_contracts[i]
+                far_price = prices_df.at[date, far_contract]
+                if m1_price != 0 and far_days and m1_days:
+                    dollar_spread = far_price - m1_price
+                    spreads_dollar.at[date, f"spread_1_{i+1}m"] = dollar_spread
+                    pct_spread = dollar_spread / m1_price
+                    spreads_percent.at[date, f"spread_1_{i+1}m_pct"] = pct_spread
+                    days_difference = far_days - m1_days
+                    if days_difference > 0:
+                        annual_spread = pct_spread * (config.TRADING_DAYS_PER_YEAR / days_difference)
+                        spreads_percent_annual.at[date, f"spread_1_{i+1}m_pct_annual"] = annual_spread
+
+    return (monthly_futures, spreads_dollar, spreads_percent,
+            spreads_percent_annual, days_to_expiry_df)
+
+@pytest.fixture
+def curve_data():
+    """
+    Eight months of business days over monthly contracts, with shuffled
+    columns, missing quotes, contracts expiring inside the range, two
+    contracts sharing an expiry, a zero front price and contracts without
+    a usable last trade date.
+    """
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range('2020-01-01', '2020-08-31')
+    expiries = pd.bdate_range('2020-01-20', periods=14, freq='BMS') + pd.Timedelta(days=14)
+    metadata = {f'CL{code}0 Comdty': {'last_trade_date': expiry.strftime('%Y-%m-%d')}
+                for code, expiry in zip('FGHJKMNQUVXZAB', expiries)}
+    metadata['CLX9 Comdty'] = {'last_trade_date': metadata['CLN0 Comdty']['last_trade_date']}
+    metadata['CLY0 Comdty'] = {'last_trade_date': ''}
+    metadata['CLW0 Comdty'] = 'not a dict'
+
+    contracts = list(metadata)
+    prices = 40 + np.cumsum(rng.normal(0, 0.5, (len(dates), len(contracts))), axis=0)
+    prices_df = pd.DataFrame(prices, index=dates, columns=contracts)
+    prices_df = prices_df.mask(rng.random(prices_df.shape) < 0.1)
+    prices_df.iloc[5, :] = np.nan
+    prices_df.loc[dates[10], 'CLG0 Comdty'] = 0.0
+    prices_df.loc[dates[10], 'CLF0 Comdty'] = np.nan
+    # Shuffled, with the tied contracts out of ticker order
+    columns = [c for c in rng.permutation(prices_df.columns) if c != 'CLX9 Comdty']
+    return prices_df[['CLX9 Comdty'] + columns], metadata
+
+def normalized(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame with contracts as objects and numbers as float64 for comparison"""
+    return pd.DataFrame({
+        column: (df[column].astype(object).where(df[column].notna(), np.nan)
+                 if column.endswith('_future')
+                 else df[column].astype('float64'))
+        for column in df.columns
+    }, index=df.index)
+
+def test_vectorized_term_structure_matches_loop(curve_data, tmp_path):
+    prices_df, metadata = curve_data
+    config = SpreadsConfig(BASE_PATH=str(tmp_path), MAX_MONTHS_FORWARD=5)
+
+    expected = loop_monthly_futures_data(prices_df, metadata, config)
+    result = create_monthly_futures_data(prices_df, metadata, config)
+
+    names = ['monthly_futures', 'spreads_dollar', 'spreads_percent',
+             'spreads_annual', 'days_to_expiry']
+    for name, frame, reference in zip(names, result, expected):
+        pd.testing.assert_frame_equal(normalized(frame), normalized(reference),
+                                      check_freq=False, obj=name)